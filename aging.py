@@ -0,0 +1,125 @@
+import csv
+import io
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+# (label, min age in days, max age in days or None for open-ended)
+AGING_BUCKETS = [
+    ("0–7 days", 0, 7),
+    ("8–30 days", 8, 30),
+    ("31–60 days", 31, 60),
+    ("60+ days", 61, None),
+]
+SETTLED_EPSILON = 0.005  # Below half a paisa a record counts as settled
+
+
+def _record_date(rec, sess):
+    """Record date as an ordinal; falls back to the session's creation date."""
+    for value in (rec.get("date"), (sess.get("created_at") or "")[:10]):
+        try:
+            return date.fromisoformat(value).toordinal()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class AgingIndex:
+    """Open (unsettled) records per trader, sorted by date, with prefix sums.
+
+    Built in one pass over the sessions. Afterwards any trader's balance as
+    of a date, or its total in an age bucket, is two binary searches and a
+    prefix-sum difference instead of a rescan of the history. Roles are
+    "seller" (payables: purchases less amountPaid) and "buyer" (receivables:
+    sales less amountReceived).
+    """
+
+    def __init__(self):
+        self._dates = {}   # (role, trader_key) -> sorted date ordinals
+        self._prefix = {}  # (role, trader_key) -> prefix sums of outstanding, len n + 1
+        self._names = {}   # (role, trader_key) -> display name (first occurrence)
+
+    @classmethod
+    def from_sessions(cls, sessions, opening_balances=()):
+        """Index of the sessions' open records, plus what is outstanding on
+        carried-forward `opening_balances`, aged from their season_end."""
+        index = cls()
+        open_records = {}
+        for sess in sessions:
+            for role, field, paid_field in (("seller", "purchases", "amountPaid"), ("buyer", "sales", "amountReceived")):
+                for rec in sess.get(field, []):
+                    outstanding = rec.get("totalAmount", 0) - rec.get(paid_field, 0)
+                    day = _record_date(rec, sess)
+                    if outstanding <= SETTLED_EPSILON or day is None:
+                        continue
+                    raw_name = rec.get("traderName", "Unknown")
+                    key = (role, raw_name.lower())
+                    index._names.setdefault(key, raw_name)
+                    open_records.setdefault(key, []).append((day, outstanding))
+        for ob in opening_balances:
+            outstanding = ob["amount"] - ob["settled"]
+            if outstanding <= SETTLED_EPSILON:
+                continue
+            key = (ob["role"], ob["trader_key"])
+            index._names.setdefault(key, ob["trader_name"])
+            open_records.setdefault(key, []).append((date.fromisoformat(ob["season_end"]).toordinal(), outstanding))
+
+        for key, items in open_records.items():
+            items.sort()
+            prefix = [0.0]
+            for _, amount in items:
+                prefix.append(prefix[-1] + amount)
+            index._dates[key] = [day for day, _ in items]
+            index._prefix[key] = prefix
+        return index
+
+    def _sum_between(self, key, first_day: int, last_day: int) -> float:
+        """Outstanding of records dated first_day..last_day (ordinals, inclusive)."""
+        dates = self._dates.get(key)
+        if not dates:
+            return 0.0
+        prefix = self._prefix[key]
+        return prefix[bisect_right(dates, last_day)] - prefix[bisect_left(dates, first_day)]
+
+    def traders(self, role: str):
+        """Display names of traders with open records in a role."""
+        return [self._names[key] for key in self._dates if key[0] == role]
+
+    def balance_as_of(self, role: str, trader: str, as_of: date) -> float:
+        """Outstanding on records dated on or before `as_of`."""
+        key = (role, trader.lower())
+        dates = self._dates.get(key)
+        if not dates:
+            return 0.0
+        return self._prefix[key][bisect_right(dates, as_of.toordinal())]
+
+    def buckets(self, role: str, trader: str, as_of: date) -> dict:
+        """Outstanding per age bucket as of a date; future-dated records are excluded."""
+        key = (role, trader.lower())
+        today = as_of.toordinal()
+        result = {}
+        for label, min_age, max_age in AGING_BUCKETS:
+            first_day = date.min.toordinal() if max_age is None else today - max_age
+            result[label] = self._sum_between(key, first_day, today - min_age)
+        return result
+
+    def report(self, role: str, as_of: date):
+        """One row per trader with bucket totals, largest balance first."""
+        rows = []
+        for name in self.traders(role):
+            buckets = self.buckets(role, name, as_of)
+            total = sum(buckets.values())
+            if total > SETTLED_EPSILON:
+                rows.append({"Trader": name, **buckets, "Total": total})
+        rows.sort(key=lambda r: r["Total"], reverse=True)
+        return rows
+
+
+def aging_report_csv(rows) -> str:
+    """CSV text of an AgingIndex.report()."""
+    out = io.StringIO()
+    fieldnames = ["Trader"] + [label for label, _, _ in AGING_BUCKETS] + ["Total"]
+    writer = csv.DictWriter(out, fieldnames=fieldnames)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: (f"{v:.2f}" if isinstance(v, float) else v) for k, v in row.items()})
+    return out.getvalue()
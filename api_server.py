@@ -0,0 +1,369 @@
+"""Read-only JSON API for the dashboard figures, next to the Streamlit app.
+
+    SUPABASE_URL=... SUPABASE_ANON_KEY=... python api_server.py --port 8502
+
+    GET /api/stats                      totals and trader balances (get_aggregate_stats)
+    GET /api/ledger?role=seller&trader=Ramesh
+                                        one trader's statement: ledger rows with running balance
+    GET /api/aging?role=buyer&as_of=2026-03-31
+                                        outstanding per trader and age bucket
+
+Every endpoint takes an optional date range (?from=YYYY-MM-DD&to=YYYY-MM-DD)
+with the app's meaning: only records dated inside it count.
+
+Requests carry the user's Supabase access token (`Authorization: Bearer
+<token>`, the one the app holds), so row level security applies as in the
+app. Responses have a strong ETag derived from the user's data version
+and the request; a client that sends it back in If-None-Match gets a 304
+for the cost of the version query. Figures come from the shared cache
+(shared_cache.py) the app fills, under the same keys, and what the API
+computes on a miss is cached there for the app too.
+
+CHILLI_BACKEND=local serves the in-process backend (local_backend.py)
+instead; it reads CHILLI_LOCAL_DB once at startup.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import local_backend
+from aging import AGING_BUCKETS, AgingIndex
+from shared_cache import DEFAULT_CACHE_PATH, SharedCache
+from singleflight import SingleFlight
+from token_refresh import is_expired_token_error, jwt_expiry, jwt_subject, supabase_client_for
+from trade_core import (
+    apply_opening_balances, get_aggregate_stats, opening_balances_in_range, range_namespace, slice_sessions,
+    trader_records, trader_statement, upgrade_session_records, version_from_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 1  # Part of every ETag: bump when a response's shape changes
+HISTORY_PAGE_ROWS = 1000  # PostgREST's default max rows per request
+HISTORY_READ_ATTEMPTS = 3  # Re-reads of a history that a write shifted mid-read
+ROLES = ("seller", "buyer")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def strong_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps([API_VERSION, *parts], default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """If-None-Match uses weak comparison: a W/ prefix on the client's tag doesn't matter."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class UserData:
+    """One request's reads for one user, through `db` (a client authorised with their token)."""
+
+    def __init__(self, db, user_id, cache: SharedCache, coalescer: SingleFlight):
+        self.db = db
+        self.user_id = user_id
+        self.cache = cache
+        self.coalescer = coalescer
+
+    def data_version(self) -> str:
+        """The user's trade_sessions version (one indexed row; also where a bad token is rejected)."""
+        res = (
+            self.db.table("trade_sessions").select("updated_at", count="exact")
+            .eq("user_id", self.user_id).order("updated_at", desc=True).limit(1).execute()
+        )
+        latest = (res.data[0]["updated_at"] or "") if res.data else ""
+        return f"{res.count or 0}:{latest}"
+
+    def opening_balances(self):
+        """[] if 008_season_close.sql isn't deployed. Small enough to read whole on every request."""
+        try:
+            res = self.db.table("opening_balances").select("*").eq("user_id", self.user_id).execute()
+        except Exception as e:
+            if _is_auth_error(e):
+                raise
+            logger.info("opening_balances unavailable: %s", e)
+            return []
+        return res.data or []
+
+    def _read_history(self, date_range):
+        start, end = None, None
+        if date_range is not None:
+            start, end = date_range
+        rows, offset = [], 0
+        while True:
+            q = self.db.table("trade_sessions").select("*").eq("user_id", self.user_id)
+            if date_range is not None:
+                q = q.or_(
+                    f"and(first_trade_date.lte.{end.isoformat()},last_trade_date.gte.{start.isoformat()}),"
+                    f"and(created_at.gte.{start.isoformat()},created_at.lt.{(end + timedelta(days=1)).isoformat()})"
+                )
+            page = q.order("created_at", desc=True).order("id").range(offset, offset + HISTORY_PAGE_ROWS - 1)
+            chunk = page.execute().data or []
+            rows += chunk
+            if len(chunk) < HISTORY_PAGE_ROWS:
+                return [upgrade_session_records(r) for r in rows], offset > 0
+            offset += HISTORY_PAGE_ROWS
+
+    def sessions(self, date_range, version: str):
+        """The user's history for date_range, from the shared cache when it holds `version`."""
+        cache_ns = range_namespace("sessions", date_range)
+        rows = self.cache.get(cache_ns, self.user_id, version)
+        if rows is not None:
+            return [upgrade_session_records(r) for r in rows]
+
+        def fetch():
+            for _ in range(HISTORY_READ_ATTEMPTS):
+                rows, paged = self._read_history(date_range)
+                # A write between pages may have shifted rows past a page boundary
+                if not paged or self.data_version() == version:
+                    self.cache.set(cache_ns, self.user_id, version, rows)
+                    return rows
+            return rows
+
+        return self.coalescer.do(("api_sessions", self.user_id, date_range, version), fetch)
+
+    def stats(self, date_range, version: str):
+        cache_ns = range_namespace("aggregate_stats", date_range)
+        stats = self.cache.get(cache_ns, self.user_id, version)
+        if stats is not None:
+            return stats
+
+        def compute():
+            stats = get_aggregate_stats(slice_sessions(self.sessions(date_range, version), date_range))
+            self.cache.set(cache_ns, self.user_id, version, stats)
+            return stats
+
+        return self.coalescer.do(("api_stats", self.user_id, date_range, version), compute)
+
+
+def _is_auth_error(exc: Exception) -> bool:
+    return is_expired_token_error(exc) or str(getattr(exc, "code", "") or "").startswith("PGRST30")
+
+
+def _param(query, name, required=False):
+    value = (query.get(name) or [""])[0].strip()
+    if required and not value:
+        raise ApiError(400, f"Missing parameter: {name}")
+    return value or None
+
+
+def _date_param(query, name):
+    value = _param(query, name)
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise ApiError(400, f"{name} must be YYYY-MM-DD")
+
+
+def _role_param(query):
+    role = _param(query, "role", required=True)
+    if role not in ROLES:
+        raise ApiError(400, "role must be seller or buyer")
+    return role
+
+
+def _date_range(query):
+    start, end = _date_param(query, "from"), _date_param(query, "to")
+    if (start is None) != (end is None):
+        raise ApiError(400, "from and to go together")
+    if start is not None and start > end:
+        raise ApiError(400, "from is after to")
+    return (start, end) if start else None
+
+
+# Each endpoint: (request params from the query string, whether it needs
+# the opening balances, and the response body from the data).
+def _stats_params(query):
+    return {"date_range": _date_range(query)}
+
+
+def _stats_body(data: UserData, version, opening, date_range):
+    stats = data.stats(date_range, version)
+    return {"stats": apply_opening_balances(stats, opening_balances_in_range(opening, date_range))}
+
+
+def _ledger_params(query):
+    return {
+        "date_range": _date_range(query),
+        "role": _role_param(query),
+        "trader": _param(query, "trader", required=True),
+    }
+
+
+def _ledger_body(data: UserData, version, opening, date_range, role, trader):
+    sessions = slice_sessions(data.sessions(date_range, version), date_range)
+    records = trader_records(sessions, trader, role)
+    balance = next(
+        (ob for ob in opening_balances_in_range(opening, date_range)
+         if ob["role"] == role and ob["trader_key"] == trader.lower()),
+        None,
+    )
+    if not records and balance is None:
+        raise ApiError(404, f"No {role} named {trader}")
+    # The statement opens with the carried-forward balance, so its pending matches /api/stats
+    return {"statement": trader_statement(records, role, balance), "opening_balance": balance}
+
+
+def _aging_params(query):
+    return {
+        "date_range": _date_range(query),
+        "role": _role_param(query),
+        # Resolved here so it is part of the ETag: the report changes daily
+        "as_of": _date_param(query, "as_of") or date.today(),
+    }
+
+
+def _aging_body(data: UserData, version, opening, date_range, role, as_of):
+    sessions = slice_sessions(data.sessions(date_range, version), date_range)
+    return {
+        "buckets": [label for label, _, _ in AGING_BUCKETS],
+        "rows": AgingIndex.from_sessions(sessions, opening_balances_in_range(opening, date_range)).report(role, as_of),
+    }
+
+
+ENDPOINTS = {
+    "/api/stats": (_stats_params, True, _stats_body),
+    "/api/ledger": (_ledger_params, True, _ledger_body),
+    "/api/aging": (_aging_params, True, _aging_body),
+}
+
+
+class ApiServer(ThreadingHTTPServer):
+    """`client_for(token)` returns a database client authorised as the token's user."""
+
+    daemon_threads = True
+
+    def __init__(self, address, client_for, cache: SharedCache, verify_expiry: bool = True):
+        super().__init__(address, ApiHandler)
+        self.client_for = client_for
+        self.cache = cache
+        self.coalescer = SingleFlight()
+        self.verify_expiry = verify_expiry
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "ChilliTrackerAPI/1"
+
+    def do_GET(self):
+        started = time.perf_counter()
+        status = 500
+        try:
+            status, body, etag = self._handle()
+        except ApiError as e:
+            status, body, etag = e.status, {"error": str(e)}, None
+        except Exception as e:
+            if _is_auth_error(e):
+                status, body, etag = 401, {"error": "Invalid or expired token"}, None
+            else:
+                logger.exception("API request failed: %s", self.path)
+                status, body, etag = 500, {"error": "Internal error"}, None
+        self._send(status, body, etag)
+        logger.info("%s %s %d in %.1f ms", self.command, self.path, status, (time.perf_counter() - started) * 1000)
+
+    def _user(self):
+        header = self.headers.get("Authorization") or ""
+        scheme, _, token = header.partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            raise ApiError(401, "Send the access token as 'Authorization: Bearer <token>'")
+        token = token.strip()
+        user_id = jwt_subject(token)
+        if user_id is None:
+            raise ApiError(401, "Invalid or expired token")
+        # Only a cheap pre-check: the database verifies the token itself
+        if self.server.verify_expiry and (jwt_expiry(token) or 0) < time.time():
+            raise ApiError(401, "Invalid or expired token")
+        return token, user_id
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path.rstrip("/"))
+        if endpoint is None:
+            raise ApiError(404, f"Unknown endpoint: {url.path}")
+        parse_params, needs_opening, build_body = endpoint
+        params = parse_params(parse_qs(url.query))
+        token, user_id = self._user()
+
+        data = UserData(self.server.client_for(token), user_id, self.server.cache, self.server.coalescer)
+        version = data.data_version()
+        opening = data.opening_balances() if needs_opening else []
+        # Payments against opening balances don't move the trade_sessions version
+        etag = strong_etag(url.path.rstrip("/"), user_id, params, version, version_from_rows(opening))
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            return 304, None, etag
+
+        body = build_body(data, version, opening, **params)
+        date_range = params["date_range"]
+        return 200, {
+            "data_version": version,
+            "from": date_range[0].isoformat() if date_range else None,
+            "to": date_range[1].isoformat() if date_range else None,
+            **{k: v for k, v in params.items() if k != "date_range"},
+            **body,
+        }, etag
+
+    def _send(self, status: int, body, etag):
+        payload = b"" if body is None else json.dumps(body, default=str).encode()
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        # Always revalidate; responses differ per token
+        self.send_header("Cache-Control", "private, no-cache")
+        self.send_header("Vary", "Authorization")
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Logged once per request in do_GET
+
+
+def make_server(host: str, port: int, backend: str = None) -> ApiServer:
+    cache = SharedCache(
+        os.environ.get("CHILLI_SHARED_CACHE_PATH", DEFAULT_CACHE_PATH),
+        int(os.environ.get("CHILLI_SHARED_CACHE_MB", "256")) * 1024 * 1024,
+    )
+    if (backend or os.environ.get("CHILLI_BACKEND", "supabase")) == "local":
+        client = local_backend.create_client()
+        return ApiServer((host, port), lambda token: client, cache)
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("Set SUPABASE_URL and SUPABASE_ANON_KEY (the app's project URL and anon key)")
+    return ApiServer((host, port), supabase_client_for(url, key), cache)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read-only JSON API for the dashboard figures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = make_server(args.host, args.port)
+    logger.info("Serving on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
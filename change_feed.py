@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import threading
+import time
+
+from trade_core import get_aggregate_stats, upgrade_session_records
+
+# Row changes pushed from the database, applied to the shared cache as they
+# arrive so open tabs refresh without re-reading the history.
+#
+# A source delivers postgres_changes events ({"type", "table", "record",
+# "old_record"}, the shape Supabase Realtime sends) for one user's rows:
+# SupabaseChangeSource over Realtime, LocalChangeSource for the in-process
+# backend and tests. ChangeFeed applies trade_sessions events to the cached
+# history and aggregate stats of that user, and keeps the resulting data
+# version, so a live user needs no version query per rerun.
+
+logger = logging.getLogger(__name__)
+
+FEED_TABLES = ("trade_sessions", "opening_balances")
+RESYNC_SECONDS = 300  # Poll the version once in a while anyway, in case an event was lost
+
+
+def _history_key(row):
+    return str(row.get("created_at") or ""), str(row.get("id") or "")
+
+
+def _comes_before(a, b) -> bool:
+    """History order: created_at descending, then id ascending."""
+    return a[0] > b[0] or (a[0] == b[0] and a[1] < b[1])
+
+
+def apply_change(rows, event):
+    """History rows (newest first) with one trade_sessions event applied, or None if it can't be.
+
+    Inserts and updates carry the whole row; a delete only its id. None
+    means the event didn't carry enough to apply (e.g. a truncated record)
+    and the history has to be read again.
+    """
+    record = event.get("record") or {}
+    old = event.get("old_record") or {}
+    row_id = record.get("id") or old.get("id")
+    if row_id is None:
+        return None
+    rows = [r for r in rows if r["id"] != row_id]
+    if event["type"] == "DELETE":
+        return rows
+    if not all(field in record for field in ("purchases", "sales", "created_at", "updated_at")):
+        return None
+    record = upgrade_session_records(dict(record))
+    key = _history_key(record)
+    at = next((i for i, r in enumerate(rows) if not _comes_before(_history_key(r), key)), len(rows))
+    rows.insert(at, record)
+    return rows
+
+
+class LocalChangeSource:
+    """In-process emitter: whatever calls emit() drives the feed (local_backend.py, tests)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> on_event
+
+    def subscribe(self, user_id, access_token, on_event, on_status):
+        with self._lock:
+            self._subscribers[user_id] = on_event
+        on_status(True)
+
+    def set_auth(self, user_id, access_token):
+        pass
+
+    def unsubscribe(self, user_id):
+        with self._lock:
+            self._subscribers.pop(user_id, None)
+
+    def emit(self, table, event_type, record=None, old_record=None):
+        """Deliver one change to the subscriber owning the row (deletes go to everyone, as in Realtime)."""
+        event = {"table": table, "type": event_type, "record": record or {}, "old_record": old_record or {}}
+        owner = (record or old_record or {}).get("user_id")
+        with self._lock:
+            targets = [cb for uid, cb in self._subscribers.items() if event_type == "DELETE" or uid == owner]
+        for on_event in targets:
+            on_event(event)
+
+
+class SupabaseChangeSource:
+    """postgres_changes over Supabase Realtime, one socket per watched user.
+
+    Each socket is authorised with that user's access token, so row level
+    security decides what it receives. Runs on its own event loop thread.
+    """
+
+    def __init__(self, url: str, key: str, tables=FEED_TABLES):
+        self.url = url
+        self.key = key
+        self.tables = tables
+        self._sockets = {}  # user_id -> AsyncRealtimeClient
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="change-feed", daemon=True).start()
+
+    def _submit(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        future.add_done_callback(
+            lambda f: f.exception() and logger.warning("change feed: %s", f.exception())
+        )
+        return future
+
+    def subscribe(self, user_id, access_token, on_event, on_status):
+        self._submit(self._subscribe(user_id, access_token, on_event, on_status))
+
+    async def _subscribe(self, user_id, access_token, on_event, on_status):
+        from realtime import AsyncRealtimeClient, RealtimePostgresChangesListenEvent, RealtimeSubscribeStates
+
+        socket = AsyncRealtimeClient(f"{self.url}/realtime/v1", self.key)
+        self._sockets[user_id] = socket
+        try:
+            await socket.connect()
+            await socket.set_auth(access_token)
+            channel = socket.channel(f"chilli-changes:{user_id}")
+            for table in self.tables:
+                def deliver(payload, table=table):
+                    on_event({**payload["data"], "table": table})
+
+                channel.on_postgres_changes(
+                    RealtimePostgresChangesListenEvent.Insert, deliver, table=table, schema="public",
+                    filter=f"user_id=eq.{user_id}",
+                )
+                channel.on_postgres_changes(
+                    RealtimePostgresChangesListenEvent.Update, deliver, table=table, schema="public",
+                    filter=f"user_id=eq.{user_id}",
+                )
+                # Deletes can't be filtered and only carry the primary key
+                channel.on_postgres_changes(
+                    RealtimePostgresChangesListenEvent.Delete, deliver, table=table, schema="public",
+                )
+            await channel.subscribe(
+                lambda state, error: on_status(state == RealtimeSubscribeStates.SUBSCRIBED)
+            )
+        except Exception:
+            on_status(False)
+            raise
+
+    def set_auth(self, user_id, access_token):
+        socket = self._sockets.get(user_id)
+        if socket is not None:
+            self._submit(socket.set_auth(access_token))
+
+    def unsubscribe(self, user_id):
+        socket = self._sockets.pop(user_id, None)
+        if socket is not None:
+            self._submit(socket.close())
+
+
+class ChangeFeed:
+    """Keeps watched users' cached history current from a change source.
+
+    Per user it tracks the data version the cache is known to hold
+    (`live_version`), an epoch that moves on every event and whenever that
+    knowledge is lost (so a read that started before can't seed a stale
+    version), and a tick count that moves on every change, which open tabs
+    watch to rerun.
+    """
+
+    def __init__(self, source, cache, version_of, namespaces=("sessions", "aggregate_stats")):
+        self.source = source
+        self.cache = cache
+        self.version_of = version_of  # history rows -> data version
+        self.sessions_ns, self.stats_ns = namespaces
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def _state(self, user_id):
+        return self._users.setdefault(user_id, {
+            "subscribed": False, "token": None, "live": False, "version": None, "seeded_at": 0.0,
+            "epoch": 0, "ticks": 0, "opening_balances": None,
+        })
+
+    def watch(self, user_id, access_token):
+        """Subscribe to the user's changes (once); later calls only pass on a rotated token."""
+        with self._lock:
+            state = self._state(user_id)
+            first, state["subscribed"] = not state["subscribed"], True
+            previous, state["token"] = state["token"], access_token
+        if first:
+            self.source.subscribe(
+                user_id, access_token,
+                on_event=lambda event: self._on_event(user_id, event),
+                on_status=lambda live: self._on_status(user_id, live),
+            )
+        elif previous != access_token:
+            self.source.set_auth(user_id, access_token)
+
+    def unwatch(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+        self.source.unsubscribe(user_id)
+
+    def _on_status(self, user_id, live: bool):
+        with self._lock:
+            state = self._state(user_id)
+            state["live"] = live
+            if not live:
+                self._forget(state)
+
+    def _forget(self, state):
+        """Drop what the feed knows about the cache (called with the lock held)."""
+        state["version"] = None
+        state["opening_balances"] = None
+        state["epoch"] += 1
+        state["ticks"] += 1
+
+    def epoch(self, user_id) -> int:
+        with self._lock:
+            return self._state(user_id)["epoch"]
+
+    def ticks(self, user_id) -> int:
+        with self._lock:
+            return self._state(user_id)["ticks"]
+
+    def live_version(self, user_id):
+        """The user's current data version if the feed is keeping it, else None (ask the database)."""
+        with self._lock:
+            state = self._users.get(user_id)
+            if not state or not state["live"] or time.monotonic() - state["seeded_at"] > RESYNC_SECONDS:
+                return None
+            return state["version"]
+
+    def seed(self, user_id, version, epoch: int):
+        """Record the version a read just cached, unless the feed moved on since `epoch` was read."""
+        with self._lock:
+            state = self._state(user_id)
+            if state["live"] and state["epoch"] == epoch:
+                state["version"] = version
+                state["seeded_at"] = time.monotonic()
+
+    def invalidate(self, user_id):
+        """Forget the user's version, e.g. after this process wrote (the event may lag the next read)."""
+        with self._lock:
+            if user_id in self._users:
+                self._forget(self._users[user_id])
+
+    def opening_balances(self, user_id):
+        with self._lock:
+            state = self._users.get(user_id)
+            return state["opening_balances"] if state and state["live"] else None
+
+    def set_opening_balances(self, user_id, rows, epoch: int):
+        with self._lock:
+            state = self._state(user_id)
+            if state["live"] and state["epoch"] == epoch:
+                state["opening_balances"] = rows
+
+    def _on_event(self, user_id, event):
+        """Apply one change; runs on the source's thread."""
+        row_id = (event.get("record") or event.get("old_record") or {}).get("id")
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                return
+            if event.get("table") != "trade_sessions":
+                cached = state["opening_balances"]
+                # Deletes reach every subscriber; only react to this user's rows
+                if event["type"] != "DELETE" or (cached and any(r["id"] == row_id for r in cached)):
+                    state["opening_balances"] = None
+                    state["epoch"] += 1
+                    state["ticks"] += 1
+                return
+            version, epoch = state["version"], state["epoch"]
+        rows = self.cache.get(self.sessions_ns, user_id, version) if version else None
+        if event["type"] == "DELETE" and (rows is None or not any(r["id"] == row_id for r in rows)):
+            return  # Someone else's row, or nothing cached that it could be in
+        rows = apply_change(rows, event) if rows is not None else None
+        if rows is not None:
+            new_version = self.version_of(rows)
+            self.cache.set(self.sessions_ns, user_id, new_version, rows)
+            self.cache.set(self.stats_ns, user_id, new_version, get_aggregate_stats(rows))
+        with self._lock:
+            if rows is not None and state["epoch"] == epoch and state["version"] == version:
+                state["version"] = new_version
+                # A read that started before this event mustn't seed its older version
+                state["epoch"] += 1
+                state["ticks"] += 1
+            else:
+                # Not seeded yet, evicted, raced another event, or the
+                # event was incomplete: the next read goes to the database
+                self._forget(state)
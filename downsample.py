@@ -0,0 +1,35 @@
+# Downsampling of chart series on the server, so a chart ships a bounded
+# number of points however long the history behind it is.
+
+
+def lttb(points, threshold: int, x=lambda p: p[0], y=lambda p: p[1]):
+    """Largest-Triangle-Three-Buckets: `threshold` of `points` that keep the line's visual shape.
+
+    `points` must be sorted by x; x(p) and y(p) must be numbers. The first
+    and last points are always kept; every bucket in between contributes
+    the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, so peaks and dips survive.
+    Returns the points unchanged when there are no more than `threshold`.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    xs = [float(x(p)) for p in points]
+    ys = [float(y(p)) for p in points]
+    every = (n - 2) / (threshold - 2)
+    sampled = [points[0]]
+    a = 0
+    for i in range(threshold - 2):
+        next_lo = int((i + 1) * every) + 1
+        next_hi = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[next_lo:next_hi]) / (next_hi - next_lo)
+        avg_y = sum(ys[next_lo:next_hi]) / (next_hi - next_lo)
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, next_lo):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,178 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = 2.0   # Write once the draft has been still this long
+MAX_DELAY_SECONDS = 10.0  # ...but never hold a changed draft longer than this
+RETRY_DELAY_SECONDS = 15  # Back-off after a failed write
+MAX_SAVED_DRAFTS = 1000  # Written snapshots remembered; a forgotten one costs a full rewrite
+
+DRAFT_FIELDS = ("current_session_id", "session_name", "purchase_entries", "sale_entries")
+
+
+def draft_snapshot(state) -> str:
+    """The in-progress session in `state` (session state) as one JSON string.
+
+    Cheap enough for every rerun; a string is also safe to hand to the
+    writer thread while the script keeps mutating the lists it came from.
+    """
+    return json.dumps(
+        {
+            **{field: state.get(field) for field in DRAFT_FIELDS},
+            "purchases": state.get("purchases") or [],
+            "sales": state.get("sales") or [],
+        },
+        sort_keys=True, default=str,
+    )
+
+
+def draft_rows(snapshot: str):
+    """(header, {record_id: record row}) as stored in session_drafts / session_draft_records."""
+    draft = json.loads(snapshot)
+    header = {field: draft.get(field) for field in DRAFT_FIELDS}
+    records = {}
+    for role, field in (("purchase", "purchases"), ("sale", "sales")):
+        for position, rec in enumerate(draft[field]):
+            records[rec["id"]] = {"record_id": rec["id"], "role": role, "position": position, "record": rec}
+    return header, records
+
+
+def is_empty_draft(header, records) -> bool:
+    return not (records or header["purchase_entries"] or header["sale_entries"])
+
+
+def draft_changes(saved, snapshot: str) -> dict:
+    """What to write so the stored draft matches `snapshot`.
+
+    `saved` is the snapshot last written (None if unknown, e.g. after a
+    restart). Returns {"clear"} to delete the draft, or {"header" (None if
+    unchanged), "upsert": changed record rows, "delete": removed record ids,
+    "replace": True if the stored records are unknown and must all go first}.
+    """
+    header, records = draft_rows(snapshot)
+    if is_empty_draft(header, records):
+        return {"clear": True}
+    if saved is None:
+        return {"clear": False, "header": header, "upsert": list(records.values()), "delete": [], "replace": True}
+    old_header, old_records = draft_rows(saved)
+    if is_empty_draft(old_header, old_records):
+        # An empty draft was cleared, not stored: nothing to diff against
+        return {"clear": False, "header": header, "upsert": list(records.values()), "delete": [], "replace": False}
+    return {
+        "clear": False,
+        "header": header if header != old_header else None,
+        "upsert": [row for rid, row in records.items() if old_records.get(rid) != row],
+        "delete": [rid for rid in old_records if rid not in records],
+        "replace": False,
+    }
+
+
+class DraftAutosaver:
+    """Writes in-progress sessions from a background thread, debounced.
+
+    Drafts are identified by a `key`, (user_id, draft_id) in the app: each
+    browser tab keeps its own draft. Reruns only call submit() with the
+    latest snapshot, which is a dict assignment. A draft is written once it
+    has been unchanged for DEBOUNCE_SECONDS (or has waited
+    MAX_DELAY_SECONDS), so a burst of edits becomes one write, and only the
+    records that changed since the last write are sent. `write_fn(key,
+    changes)` performs the write (draft_changes() describes `changes`).
+    """
+
+    def __init__(self, write_fn, debounce: float = DEBOUNCE_SECONDS, max_delay: float = MAX_DELAY_SECONDS):
+        self._write_fn = write_fn
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._pending = {}  # key -> {snapshot, first_at, last_at, retry_at}
+        self._saved = OrderedDict()  # key -> snapshot last written (or restored), oldest first
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, key, snapshot: str):
+        """Queue the current draft; a no-op if it matches what is queued or saved."""
+        now = time.time()
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is None:
+                if self._saved.get(key) == snapshot:
+                    return
+                self._pending[key] = {"snapshot": snapshot, "first_at": now, "last_at": now, "retry_at": 0}
+            elif pending["snapshot"] == snapshot:
+                return
+            else:
+                pending.update(snapshot=snapshot, last_at=now)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def mark_saved(self, key, snapshot):
+        """Record what the server holds (after a restore), so the next write is a diff."""
+        with self._cond:
+            self._remember(key, snapshot)
+
+    def clear(self, key, empty_snapshot: str):
+        """Delete the draft now (the session was saved or reset)."""
+        with self._cond:
+            self._pending[key] = {"snapshot": empty_snapshot, "first_at": 0, "last_at": 0, "retry_at": 0}
+            self._ensure_thread()
+            self._cond.notify()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def _write(self, key, pending):
+        snapshot = pending["snapshot"]
+        with self._cond:
+            saved = self._saved.get(key)
+        changes = draft_changes(saved, snapshot)
+        try:
+            if changes["clear"]:
+                if saved is None or not is_empty_draft(*draft_rows(saved)):
+                    self._write_fn(key, changes)
+            elif changes["header"] is not None or changes["upsert"] or changes["delete"]:
+                self._write_fn(key, changes)
+        except Exception as e:
+            logger.warning("Draft autosave failed for %s: %s", key, e)
+            with self._cond:
+                # Retry unless a newer draft was queued meanwhile (it'll diff from `saved` too)
+                self._pending.setdefault(key, {**pending, "retry_at": time.time() + RETRY_DELAY_SECONDS})
+                self._cond.notify()
+            return
+        with self._cond:
+            self._remember(key, snapshot)
+
+    def _remember(self, key, snapshot):
+        # Tabs come and go without telling us, so only the latest drafts are kept
+        self._saved[key] = snapshot
+        self._saved.move_to_end(key)
+        while len(self._saved) > MAX_SAVED_DRAFTS:
+            self._saved.popitem(last=False)
+
+    # ── Scheduler ─────────────────────────────────────────────────────
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="draft-autosave", daemon=True)
+            self._thread.start()
+
+    def _due_at(self, pending) -> float:
+        due = min(pending["last_at"] + self._debounce, pending["first_at"] + self._max_delay)
+        return max(due, pending["retry_at"])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = [(self._due_at(p), key) for key, p in self._pending.items()]
+                if not due:
+                    self._cond.wait()
+                    continue
+                due_at, key = min(due)
+                delay = due_at - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                pending = self._pending.pop(key)
+            self._write(key, pending)
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+
+# Spelling variants of the same sound in romanised Telugu/Hindi names
+# ("Sreenivas"/"Srinivas", "Venkatesh"/"Wenkatesh"), applied in order
+TRANSLITERATION_FOLDS = [
+    ("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"),
+    ("th", "t"), ("dh", "d"), ("bh", "b"), ("kh", "k"), ("gh", "g"),
+    ("ph", "p"), ("sh", "s"), ("ck", "k"), ("q", "k"), ("w", "v"), ("z", "j"),
+]
+HONORIFICS = {"sri", "shri", "sree", "garu", "mr", "ms", "m/s"}
+MAX_BLOCK_SIZE = 200  # Trigrams shared by more names than this don't generate candidates
+
+
+def fold_name(name: str) -> str:
+    """Comparison key: no case, accents, punctuation, honorifics or spelling variants; sorted words."""
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    words = []
+    for word in re.split(r"[^a-z/]+", text):
+        if not word or word in HONORIFICS:
+            continue
+        word = word.replace("/", "")
+        for src, dst in TRANSLITERATION_FOLDS:
+            word = word.replace(src, dst)
+        words.append(re.sub(r"(.)\1+", r"\1", word))  # "Reddy" == "Redy"
+    return " ".join(sorted(words))
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance of a and b, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def _trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def find_duplicate_clusters(names, max_distance_ratio: float = 0.2):
+    """Groups of names that are probably the same trader, largest first.
+
+    Names with the same folded key are merged outright. Other pairs are
+    only compared if they share a selective trigram (blocking) and enough
+    trigrams overall to be within the edit-distance limit, then verified
+    with a bounded Levenshtein distance on the folded keys.
+    """
+    names = list(dict.fromkeys(n for n in names if n))
+    keys = [fold_name(n) for n in names]
+    uf = _UnionFind(len(names))
+
+    by_key = {}
+    for i, key in enumerate(keys):
+        if key in by_key:
+            uf.union(i, by_key[key])
+        else:
+            by_key[key] = i
+
+    # One representative per folded key takes part in fuzzy matching
+    reps = [(key.replace(" ", ""), i) for key, i in by_key.items()]
+    grams = [_trigrams(key) for key, _ in reps]
+    postings = {}
+    for r, gs in enumerate(grams):
+        for g in gs:
+            postings.setdefault(g, []).append(r)
+
+    for r, (key, i) in enumerate(reps):
+        candidates = set()
+        for g in grams[r]:
+            posting = postings[g]
+            if len(posting) <= MAX_BLOCK_SIZE:
+                candidates.update(o for o in posting if o > r)
+        for o in candidates:
+            other_key, j = reps[o]
+            limit = max(1, int(min(len(key), len(other_key)) * max_distance_ratio))
+            # Each edit changes at most 3 trigrams
+            if len(grams[r] & grams[o]) < max(len(grams[r]), len(grams[o])) - 3 * limit:
+                continue
+            if bounded_levenshtein(key, other_key, limit) <= limit:
+                uf.union(i, j)
+
+    clusters = {}
+    for i, name in enumerate(names):
+        clusters.setdefault(uf.find(i), []).append(name)
+    return sorted((c for c in clusters.values() if len(c) > 1), key=len, reverse=True)
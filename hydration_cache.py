@@ -0,0 +1,193 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+DEFAULT_TOTAL_BUDGET_BYTES = 512 * 1024 * 1024
+DEFAULT_IDLE_SECONDS = 1800
+
+_ATOMS = (str, bytes, int, float, complex, bool, type(None))
+
+
+def deep_sizeof(obj) -> int:
+    """Approximate bytes held by `obj` and everything reachable from it.
+
+    Follows dicts, lists, tuples, sets and plain objects' attributes; an
+    object that reports its own size (a DataFrame, an array) is taken at
+    its word. An object reached twice (e.g. the key strings json.loads
+    shares between rows) is counted once. None, booleans and small ints are
+    shared by the interpreter and not counted.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if o is None or o is True or o is False or (type(o) is int and -5 <= o <= 256):
+            continue
+        if type(o) is not float:  # Decoded floats are never shared; skip tracking them
+            if id(o) in seen:
+                continue
+            seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, _ATOMS) or (
+            not isinstance(o, (dict, list, tuple, set, frozenset)) and type(o).__sizeof__ is not object.__sizeof__
+        ):
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        else:
+            attrs = getattr(o, "__dict__", None)
+            if attrs is not None:
+                stack.append(attrs)
+            for slot in getattr(type(o), "__slots__", ()):
+                if isinstance(slot, str) and hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
+
+
+class HydrationCache:
+    """Decoded payloads held in process memory, with byte budgets per user and in all.
+
+    Entries are keyed by (namespace, data version) like SharedCache's, and
+    every tab of a user shares one entry instead of keeping its own copy in
+    session state. Entries are least-recently-used ordered across users:
+    storing one that takes its user over `budget_bytes` evicts that user's
+    oldest entries first, and one that takes the process over
+    `total_budget_bytes` evicts the oldest entries of anyone. A payload
+    bigger than either budget isn't kept. A user that hasn't read or stored
+    anything for `idle_seconds` is dropped (checked whenever the cache is
+    used). Callers treat a miss as "read it again" (the shared cache or the
+    database), so eviction only costs a refetch.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int = DEFAULT_BUDGET_BYTES,
+        total_budget_bytes: int = DEFAULT_TOTAL_BUDGET_BYTES,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+    ):
+        self.budget_bytes = budget_bytes
+        self.total_budget_bytes = total_budget_bytes
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, namespace, version) -> (value, size), least recently used first
+        self._user_bytes = {}  # user_id -> bytes of their entries
+        self._total_bytes = 0
+        self._used_at = {}  # user_id -> monotonic time of their last get/put
+        self._counters = {}  # user_id -> {hits, misses, evictions, oversized}
+        self._oversized = {}  # user_id -> {(namespace, version)} measured over budget, not to be measured again
+
+    def _count(self, user_id, counter: str):
+        counters = self._counters.setdefault(user_id, {"hits": 0, "misses": 0, "evictions": 0, "oversized": 0})
+        counters[counter] += 1
+
+    def _touch(self, user_id):
+        now = time.monotonic()
+        self._used_at[user_id] = now
+        for idle_user in [u for u, used_at in self._used_at.items() if now - used_at > self.idle_seconds]:
+            logger.info("Dropping hydrated payloads of %s, idle for %ds", idle_user, now - self._used_at[idle_user])
+            self._drop_user(idle_user)
+            self._counters.pop(idle_user, None)
+
+    def _drop_user(self, user_id):
+        for key in [k for k in self._entries if k[0] == user_id]:
+            self._total_bytes -= self._entries.pop(key)[1]
+        self._user_bytes.pop(user_id, None)
+        self._used_at.pop(user_id, None)
+        self._oversized.pop(user_id, None)
+
+    def _evict(self, key):
+        _, size = self._entries.pop(key)
+        user_id = key[0]
+        self._user_bytes[user_id] -= size
+        if not self._user_bytes[user_id]:
+            del self._user_bytes[user_id]
+        self._total_bytes -= size
+        self._count(user_id, "evictions")
+        logger.info("Evicted hydration payload %s@%s of %s (%d bytes)", key[1], key[2], user_id, size)
+
+    def get(self, user_id, namespace: str, version: str):
+        """The stored value, or None if it was never stored or has been evicted."""
+        key = (user_id, namespace, version)
+        with self._lock:
+            self._touch(user_id)
+            if key not in self._entries:
+                self._count(user_id, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(user_id, "hits")
+            return self._entries[key][0]
+
+    def put(self, user_id, namespace: str, version: str, value):
+        """Store `value` for the user and return it, dropping older versions of the namespace.
+
+        Storing the object already held for that version only marks it
+        used, so it isn't measured again; nor is one already found to be
+        over budget.
+        """
+        key = (user_id, namespace, version)
+        with self._lock:
+            self._touch(user_id)
+            if key in self._entries and self._entries[key][0] is value:
+                self._entries.move_to_end(key)
+                return value
+            if (namespace, version) in self._oversized.get(user_id, ()):
+                return value
+        size = deep_sizeof(value)  # Outside the lock: linear in the payload
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == user_id and k[1] == namespace]:
+                _, stale_size = self._entries.pop(stale)
+                self._user_bytes[user_id] -= stale_size
+                self._total_bytes -= stale_size
+            oversized = self._oversized.setdefault(user_id, set())
+            oversized -= {k for k in oversized if k[0] == namespace}
+            limit = min(self.budget_bytes, self.total_budget_bytes)
+            if size > limit:
+                oversized.add((namespace, version))
+                self._count(user_id, "oversized")
+                logger.warning(
+                    "Hydration payload %s@%s of %s is %d bytes, over the %d byte budget; not kept",
+                    namespace, version, user_id, size, limit,
+                )
+                return value
+            self._entries[key] = (value, size)
+            self._user_bytes[user_id] = self._user_bytes.get(user_id, 0) + size
+            self._total_bytes += size
+            while self._user_bytes[user_id] > self.budget_bytes:
+                self._evict(next(k for k in self._entries if k[0] == user_id))
+            while self._total_bytes > self.total_budget_bytes:
+                self._evict(next(iter(self._entries)))
+            logger.info(
+                "Hydrated %s@%s for %s: %d bytes, %d/%d bytes of the user's budget, %d/%d in all",
+                namespace, version, user_id, size, self._user_bytes.get(user_id, 0), self.budget_bytes,
+                self._total_bytes, self.total_budget_bytes,
+            )
+        return value
+
+    def forget(self, user_id):
+        """Drop everything held for the user (logout, or their data changed)."""
+        with self._lock:
+            self._drop_user(user_id)
+
+    def stats(self, user_id) -> dict:
+        """The user's entries ("namespace@version" -> bytes), bytes in use, budget and hit/miss/eviction counts."""
+        with self._lock:
+            return {
+                "entries": {f"{ns}@{version}": size for (uid, ns, version), (_, size) in self._entries.items()
+                            if uid == user_id},
+                "bytes": self._user_bytes.get(user_id, 0),
+                "budget_bytes": self.budget_bytes,
+                **self._counters.get(user_id, {"hits": 0, "misses": 0, "evictions": 0, "oversized": 0}),
+            }
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes
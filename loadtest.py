@@ -0,0 +1,264 @@
+"""Concurrent-user load test for streamlit_app.py.
+
+Starts the app with `streamlit run` on the in-process backend
+(CHILLI_BACKEND=local, see local_backend.py) and connects N headless
+clients to it over Streamlit's websocket protocol, the way N browser tabs
+would. Every client logs in as its own trader and repeats the day-to-day
+workflow: add a purchase entry, save the purchase, add a sale entry, save
+the sale, save the session, open the seller and record a payment. Each
+step is one rerun; its latency is the time from sending the widget change
+to the script finishing.
+
+For every N it reports rerun latency p50/p95/p99, reruns per second and
+the server process's RSS, and the largest N whose p95 stayed within
+--p95-budget-ms:
+
+    pip install -r requirements-loadtest.txt
+    python loadtest.py --users 1,5,10,20 --iterations 3 --json loadtest.json
+
+AppTest isn't used because it swaps process-wide runtime state on every
+run, so it can't drive concurrent sessions in one process.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+RERUN_TIMEOUT = 120  # Seconds before a rerun counts as failed
+SERVER_START_TIMEOUT = 60
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of process `pid`."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+    return int(out.strip() or 0) / 1024
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "CHILLI_BACKEND": "local",
+        "CHILLI_SHARED_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "cache.sqlite3"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f"streamlit didn't start on port {port}")
+
+
+class VirtualUser:
+    """One browser session: sends widget changes, waits for the rerun to finish."""
+
+    def __init__(self, url: str, email: str):
+        self.url = url
+        self.email = email
+        self.seller = f"Seller {email.split('@')[0]}"
+        self.buyer = f"Buyer {email.split('@')[0]}"
+        self.widgets = {}   # user key -> widget id, from the last run
+        self.labels = {}    # button label -> widget id, for unkeyed buttons
+        self.latencies = []  # (step, seconds)
+        self._ws = None
+
+    async def _rerun(self, step: str, changes=()):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        for key, value in changes:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = self.widgets[key] if key in self.widgets else self.labels[key]
+            if value is True:
+                state.trigger_value = True
+            else:
+                state.string_value = value
+        started = time.perf_counter()
+        await self._ws.send(msg.SerializeToString())
+        self.widgets, self.labels = {}, {}
+        # st.rerun() ends a run early and starts another; wait for the last
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await asyncio.wait_for(self._ws.recv(), RERUN_TIMEOUT))
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                self._note_element(step, fwd.delta.new_element)
+            elif kind == "script_finished" and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.latencies.append((step, time.perf_counter() - started))
+
+    def _note_element(self, step: str, element):
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            raise RuntimeError(f"{self.email} {step}: {element.exception.type}: {element.exception.message}")
+        widget_id = getattr(getattr(element, kind), "id", "")
+        if widget_id.startswith("$$ID-"):
+            user_key = widget_id.split("-", 2)[2]
+            self.widgets[user_key] = widget_id
+            if kind == "button":
+                self.labels[element.button.label] = widget_id
+
+    async def run(self, iterations: int):
+        async with websockets.connect(
+            f"{self.url}/_stcore/stream", subprotocols=["streamlit"], max_size=None,
+        ) as self._ws:
+            await self._rerun("open")
+            await self._rerun("login", [
+                ("login_email", self.email),
+                ("login_pw", "load-test"),
+                ("FormSubmitter:login_form-Login", True),
+            ])
+            for n in range(iterations):
+                await self._workflow(n)
+
+    async def _workflow(self, n: int):
+        await self._rerun("add purchase entry", [
+            ("purchase_trader_input", self.seller),
+            ("p_bags", "5"), ("p_weight", "528.5"), ("p_rate", str(15000 + n)),
+            ("FormSubmitter:purchase_entry_form-+ Add", True),
+        ])
+        await self._rerun("save purchase", [("save_purchase", True)])
+        await self._rerun("add sale entry", [
+            ("sale_trader_input", self.buyer),
+            ("s_bags", "5"), ("s_weight", "528.5"), ("s_rate", str(16000 + n)),
+            ("FormSubmitter:sale_entry_form-+ Add", True),
+        ])
+        await self._rerun("save sale", [("save_sale", True)])
+        await self._rerun("save session", [("Save Session", True)])
+        await self._rerun("open trader", [(f"sel_toggle_{self.seller}", True)])
+        await self._rerun("record payment", [
+            (f"sel_adv_{self.seller}", "1000"),
+            (f"sel_adv_btn_{self.seller}", True),
+        ])
+        await self._rerun("close trader", [(f"sel_toggle_{self.seller}", True)])
+
+
+async def run_level(url: str, users: int, iterations: int, run_id: str):
+    vusers = [VirtualUser(url, f"load-{run_id}-{i}@example.com") for i in range(users)]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(vu.run(iterations) for vu in vusers), return_exceptions=True)
+    wall = time.perf_counter() - started
+    errors = [f"{type(r).__name__}: {r}" for r in results if isinstance(r, BaseException)]
+    return vusers, wall, errors
+
+
+def summarize(users: int, vusers, wall: float, errors, rss: float, rss_idle: float) -> dict:
+    latencies = [s * 1000 for vu in vusers for _, s in vu.latencies]
+    by_step = {}
+    for vu in vusers:
+        for step, s in vu.latencies:
+            by_step.setdefault(step, []).append(s * 1000)
+
+    def pct(p):
+        return round(percentile(latencies, p), 1) if latencies else None
+
+    return {
+        "users": users,
+        "reruns": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "server_rss_mb": round(rss, 1),
+        "rss_per_user_mb": round((rss - rss_idle) / users, 2),
+        "steps_p95_ms": {step: round(percentile(v, 95), 1) for step, v in by_step.items()},
+    }
+
+
+def capacity(levels, p95_budget_ms: float):
+    """Largest tested user count whose p95 stayed within budget with no errors."""
+    ok = [
+        lv["users"] for lv in levels
+        if not lv["errors"] and lv["p95_ms"] is not None and lv["p95_ms"] <= p95_budget_ms
+    ]
+    return max(ok) if ok else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for streamlit_app.py")
+    parser.add_argument("--users", default="1,5,10,20", help="comma-separated concurrent user counts")
+    parser.add_argument("--iterations", type=int, default=3, help="workflow iterations per user")
+    parser.add_argument("--p95-budget-ms", type=float, default=1000.0, help="rerun p95 that counts as acceptable")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_server(port)
+    url = f"ws://127.0.0.1:{port}"
+    levels = []
+    try:
+        # One unreported pass first, so imports and caches aren't billed to the first level
+        asyncio.run(run_level(url, 1, 1, f"warmup{int(time.time())}"))
+        rss_idle = rss_mb(server.pid)
+        print(f"server pid {server.pid}, RSS after warm-up {rss_idle:.1f} MB")
+        print(f"{'users':>5} {'reruns':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'MB/user':>8} errors")
+        for users in (int(u) for u in args.users.split(",")):
+            # Fresh accounts per level, so earlier levels' history doesn't slow later ones
+            run_id = f"{users}u{int(time.time())}"
+            vusers, wall, errors = asyncio.run(run_level(url, users, args.iterations, run_id))
+            level = summarize(users, vusers, wall, errors, rss_mb(server.pid), rss_idle)
+            levels.append(level)
+            print(
+                f"{level['users']:>5} {level['reruns']:>6} {level['throughput_rps']:>7} {level['p50_ms']:>8} "
+                f"{level['p95_ms']:>8} {level['p99_ms']:>8} {level['server_rss_mb']:>8} "
+                f"{level['rss_per_user_mb']:>8} {len(errors)}"
+            )
+            for error in errors:
+                print(f"      ! {error}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    limit = capacity(levels, args.p95_budget_ms)
+    if limit is None:
+        print(f"No tested level kept rerun p95 within {args.p95_budget_ms:.0f} ms")
+    else:
+        print(f"Capacity at p95 <= {args.p95_budget_ms:.0f} ms: {limit} concurrent users")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"p95_budget_ms": args.p95_budget_ms, "capacity_users": limit, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
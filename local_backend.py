@@ -0,0 +1,313 @@
+import base64
+import copy
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from change_feed import FEED_TABLES, LocalChangeSource
+
+# In-process stand-in for the parts of the Supabase client the app uses.
+# Selected with CHILLI_BACKEND=local (see get_supabase()); used for local
+# development and the load test, never in production. Rows live in memory
+# and are written through to CHILLI_LOCAL_DB as JSON if that is set.
+# Writes to the change-feed tables are announced on `client.changes`, the
+# way Supabase Realtime announces them.
+
+TOKEN_TTL_SECONDS = 3600
+
+
+class LocalBackendError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _token(user_id: str, ttl: float) -> str:
+    """An unsigned JWT-shaped token; only its `exp` claim is ever read."""
+    payload = json.dumps({"sub": user_id, "exp": int(time.time() + ttl)}).encode()
+    return "local." + base64.urlsafe_b64encode(payload).decode().rstrip("=") + ".unsigned"
+
+
+class _Store:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.users = {}  # email -> user id
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.tables = saved.get("tables", {})
+            self.users = saved.get("users", {})
+
+    def table(self, name):
+        return self.tables.setdefault(name, {})
+
+    def persist(self):
+        """Write the whole store through to disk (called with the lock held)."""
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"tables": self.tables, "users": self.users}, f)
+        os.replace(tmp, self.path)
+
+
+def _compare(value, op, operand):
+    if op == "is":
+        return value is None if operand == "null" else str(value).lower() == operand
+    if value is None:
+        return False
+    # Dates and timestamps are ISO strings, so text order is time order;
+    # numeric columns compare as numbers
+    if isinstance(operand, str) and isinstance(value, (int, float)) and not isinstance(value, bool):
+        operand = type(value)(operand)
+    return {
+        "eq": value == operand, "neq": value != operand,
+        "lt": value < operand, "lte": value <= operand,
+        "gt": value > operand, "gte": value >= operand,
+    }[op]
+
+
+def _sort_key(value):
+    return (value is None, "" if value is None else value)
+
+
+def _parse_or(expr: str):
+    """PostgREST `or` filter -> list of AND groups of (column, op, operand)."""
+    groups = []
+    for part in re.findall(r"and\(([^()]*)\)|([^,()]+)", expr):
+        conditions = part[0].split(",") if part[0] else [part[1]]
+        groups.append([tuple(c.strip().split(".", 2)) for c in conditions])
+    return groups
+
+
+class _Query:
+    """Chainable query with the postgrest-py builder's method names."""
+
+    def __init__(self, store, table, changes=None):
+        self._store = store
+        self._table = table
+        self._changes = changes
+        self._op = "select"
+        self._payload = None
+        self._columns = None
+        self._count = None
+        self._filters = []
+        self._orders = []
+        self._offset = 0
+        self._limit = None
+
+    def select(self, columns="*", count=None):
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        self._count = count
+        return self
+
+    def insert(self, payload):
+        self._op, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", ignore_duplicates=False, **_):
+        self._op, self._payload = "upsert", payload
+        self._conflict = [c.strip() for c in on_conflict.split(",")]
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self._op, self._payload = "update", payload
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def _filter(self, column, op, operand):
+        self._filters.append(lambda row: _compare(row.get(column), op, operand))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def or_(self, expr):
+        groups = _parse_or(expr)
+        self._filters.append(
+            lambda row: any(all(_compare(row.get(c), op, v) for c, op, v in g) for g in groups)
+        )
+        return self
+
+    def order(self, column, desc=False):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def range(self, start, end):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self):
+        with self._store.lock:
+            rows = self._store.table(self._table)
+            if self._op in ("insert", "upsert"):
+                result, events = self._write(rows)
+            else:
+                matched = [r for r in rows.values() if all(f(r) for f in self._filters)]
+                if self._op == "update":
+                    for row in matched:
+                        row.update(copy.deepcopy(self._payload))
+                        row["updated_at"] = _now()
+                    events = ["UPDATE"] * len(matched)
+                elif self._op == "delete":
+                    for row in matched:
+                        del rows[row["id"]]
+                    events = ["DELETE"] * len(matched)
+                else:
+                    return self._read(matched)
+                result = matched
+            self._store.persist()
+            result = copy.deepcopy(result)
+        if self._changes is not None and self._table in FEED_TABLES:
+            for event_type, row in zip(events, result):
+                if event_type == "DELETE":
+                    # Realtime sends only the primary key of a deleted row
+                    self._changes.emit(self._table, event_type, old_record={"id": row["id"]})
+                else:
+                    self._changes.emit(self._table, event_type, record=copy.deepcopy(row))
+        return SimpleNamespace(data=result, count=None)
+
+    def _write(self, rows):
+        """(written rows, "INSERT"/"UPDATE" for each)."""
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        written, events = [], []
+        for item in payload:
+            existing = None
+            if self._op == "upsert" and self._conflict == ["id"]:
+                existing = rows.get(item.get("id"))
+            elif self._op == "upsert":
+                existing = next(
+                    (r for r in rows.values() if all(r.get(c) == item.get(c) for c in self._conflict)), None,
+                )
+            if existing is not None and self._ignore_duplicates:
+                continue
+            if existing is not None:
+                existing.update(copy.deepcopy(item))
+                existing["updated_at"] = _now()
+                written.append(existing)
+                events.append("UPDATE")
+                continue
+            stamp = _now()
+            row = {"id": str(uuid.uuid4()), "created_at": stamp, "updated_at": stamp, **copy.deepcopy(item)}
+            rows[row["id"]] = row
+            written.append(row)
+            events.append("INSERT")
+        return written, events
+
+    def _read(self, matched):
+        for column, desc in reversed(self._orders):
+            # NULLs last ascending and first descending, as in Postgres
+            matched.sort(key=lambda r, c=column: _sort_key(r.get(c)), reverse=desc)
+        total = len(matched)
+        end = None if self._limit is None else self._offset + self._limit
+        page = matched[self._offset:end]
+        if self._columns is not None:
+            page = [{c: r.get(c) for c in self._columns} for r in page]
+        return SimpleNamespace(data=copy.deepcopy(page), count=total if self._count else None)
+
+
+class _Auth:
+    def __init__(self, store):
+        self._store = store
+        self._refresh_tokens = {}  # refresh token -> user
+
+    def _session(self, user):
+        refresh_token = uuid.uuid4().hex
+        self._refresh_tokens[refresh_token] = user
+        session = SimpleNamespace(
+            user=user,
+            access_token=_token(user.id, TOKEN_TTL_SECONDS),
+            refresh_token=refresh_token,
+        )
+        return SimpleNamespace(user=user, session=session)
+
+    def sign_up(self, credentials):
+        email = credentials["email"].strip().lower()
+        with self._store.lock:
+            if email in self._store.users:
+                raise LocalBackendError("User already registered")
+            self._store.users[email] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"chilli-local:{email}"))
+            self._store.persist()
+        return self.sign_in_with_password(credentials)
+
+    def sign_in_with_password(self, credentials):
+        """Any password is accepted; unknown emails are registered on first sign-in."""
+        email = credentials["email"].strip().lower()
+        with self._store.lock:
+            user_id = self._store.users.get(email)
+            if user_id is None:
+                user_id = self._store.users[email] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"chilli-local:{email}"))
+                self._store.persist()
+            return self._session(SimpleNamespace(id=user_id, email=email))
+
+    def refresh_session(self, refresh_token=None):
+        with self._store.lock:
+            user = self._refresh_tokens.pop(refresh_token, None)
+            if user is None:
+                raise LocalBackendError("Invalid Refresh Token")
+            return self._session(user)
+
+    def get_session(self):
+        # The client is shared by every browser session, so it holds no
+        # session of its own to recover; each user signs in
+        return None
+
+    def sign_out(self):
+        pass
+
+
+class LocalClient:
+    def __init__(self, path=None):
+        self._store = _Store(path)
+        self.auth = _Auth(self._store)
+        self.changes = LocalChangeSource()
+
+    def table(self, name):
+        return _Query(self._store, name, self.changes)
+
+    def rpc(self, name, params=None):
+        # No SQL functions here; callers already fall back when an RPC isn't deployed
+        raise LocalBackendError(f"Could not find the function public.{name}", code="PGRST202")
+
+
+def create_client(path=None) -> LocalClient:
+    return LocalClient(path if path is not None else os.environ.get("CHILLI_LOCAL_DB"))
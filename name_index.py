@@ -0,0 +1,138 @@
+import heapq
+import math
+from bisect import insort
+from collections import Counter
+from datetime import date
+
+TOP_K = 8                # Suggestions kept on every trie node
+HALF_LIFE_DAYS = 90.0    # A use this long ago counts half as much as one today
+_EPOCH = date(2000, 1, 1).toordinal()
+
+
+def _trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # [(-score, key)] ascending, i.e. best first; at most TOP_K
+
+
+class TraderNameIndex:
+    """Known trader names for typeahead: a prefix trie plus a trigram index.
+
+    Names are matched case-insensitively and shown with their first-seen
+    spelling. Each use adds 2 ** (days since 2000 / HALF_LIFE_DAYS) to the
+    name's score, which ranks by recency-weighted frequency without ever
+    having to decay existing scores: scores only grow, so every trie node
+    can keep its own top-K up to date on insert and a prefix lookup is a
+    walk down the prefix.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._scores = {}    # key -> score
+        self._names = {}     # key -> display name
+        self._postings = {}  # trigram -> set of keys
+        self._ranked = None  # display names by score, rebuilt lazily
+        self._memo = {}      # (text, limit) -> suggestions; reruns repeat the same query
+
+    def __len__(self):
+        return len(self._scores)
+
+    @classmethod
+    def from_records(cls, uses):
+        """Index built from (name, day) pairs; `day` is a date or None for today."""
+        index = cls()
+        for name, day in uses:
+            index.add(name, day)
+        return index
+
+    def add(self, name: str, day: date = None):
+        """Record one use of a name."""
+        name = (name or "").strip()
+        if not name:
+            return
+        key = name.lower()
+        ordinal = (day or date.today()).toordinal()
+        # Clamped so a mistyped far-future date can't overflow the float
+        weight = math.pow(2.0, min((ordinal - _EPOCH) / HALF_LIFE_DAYS, 1000.0))
+        score = self._scores.get(key, 0.0) + weight
+        if key not in self._scores:
+            self._names[key] = name
+            for gram in _trigrams(key):
+                self._postings.setdefault(gram, set()).add(key)
+        self._scores[key] = score
+        self._ranked = None
+        self._memo.clear()
+
+        node = self._root
+        self._offer(node, key, score)
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+            self._offer(node, key, score)
+
+    @staticmethod
+    def _offer(node, key, score):
+        top = node.top
+        for i, entry in enumerate(top):
+            if entry[1] == key:
+                del top[i]
+                break
+        else:
+            if len(top) == TOP_K and -score >= top[-1][0]:
+                return
+        insort(top, (-score, key))
+        del top[TOP_K:]
+
+    def suggest(self, text: str, limit: int = 5):
+        """Display names for a partial name: prefix matches first, then fuzzy (trigram) ones."""
+        key = (text or "").strip().lower()
+        if not key:
+            return []
+        if (key, limit) not in self._memo:
+            if len(self._memo) >= 256:
+                self._memo.clear()
+            self._memo[(key, limit)] = self._suggest(key, limit)
+        return self._memo[(key, limit)]
+
+    def _suggest(self, key: str, limit: int):
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                break
+        found = [k for _, k in node.top[:limit]] if node is not None else []
+
+        if len(found) < limit:
+            found += self._fuzzy(key, limit - len(found), exclude=set(found))
+        return [self._names[k] for k in found]
+
+    def _fuzzy(self, key: str, limit: int, exclude):
+        """Names sharing at least half of the query's trigrams, most shared first."""
+        postings = sorted((self._postings.get(g, ()) for g in _trigrams(key)), key=len)
+        need = max(1, len(postings) // 2)
+        # A name sharing `need` trigrams must appear in one of the
+        # len - need + 1 rarest postings; the common ones are only probed
+        split = len(postings) - need + 1
+        counts = Counter()
+        for posting in postings[:split]:
+            counts.update(posting)
+        scored = []
+        for k, n in counts.items():
+            if k in exclude:
+                continue
+            n += sum(1 for posting in postings[split:] if k in posting)
+            if n >= need:
+                scored.append((n, self._scores[k], k))
+        return [k for _, _, k in heapq.nlargest(limit, scored)]
+
+    def ranked_names(self):
+        """Every known display name, best ranked first."""
+        if self._ranked is None:
+            self._ranked = [self._names[k] for k in sorted(self._scores, key=self._scores.get, reverse=True)]
+        return self._ranked
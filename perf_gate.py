@@ -0,0 +1,618 @@
+"""Correctness and speed gate for the trade computations' fast paths.
+
+    python perf_gate.py                      # golden + differential checks, then benchmarks vs baselines
+    python perf_gate.py check --skip-bench   # correctness only
+    python perf_gate.py update-baselines     # after an intended speed change, on the reference machine
+    python perf_gate.py update-golden        # after an intended change to the reference output
+    python perf_gate.py build-corpus [--from-dump sessions.ndjson]
+
+The golden corpus (perf/golden_corpus.ndjson) is a history of sessions in
+history order with the messy cases real data has: case-variant trader
+names, records missing fields (written before the record schema version),
+zero-bag records, non-ISO dates, compact-encoded entries, tied created_at
+stamps and sales whose sourceSeller is dangling or only appears in older
+sessions. It is synthetic, or anonymized from a dump with --from-dump.
+
+`check` first compares the reference functions (get_aggregate_stats,
+trader_records) with their stored output on the corpus
+(perf/golden_expected.json), then every fast path against the reference:
+chunked and merged aggregation, change-feed application, the shared
+cache and record codec round trips, trader_ledgers and AgingIndex.
+
+Benchmarks time the hot functions on the corpus scaled up BENCH_SCALE
+times and fail when one is more than --threshold slower than
+perf/baselines.json. Timings are normalised by a fixed calibration loop
+timed alongside them, so baselines recorded on one machine still
+roughly apply on another. Exits 1 on any failure.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from aging import AGING_BUCKETS, SETTLED_EPSILON, AgingIndex
+from change_feed import apply_change
+from record_codec import decode_records, encode_records
+from shared_cache import SharedCache
+from trade_core import (
+    AggregateBuilder, get_aggregate_stats, record_day, slice_sessions, trader_ledgers, trader_records,
+    upgrade_session_records, weigh_entry,
+)
+
+PERF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf")
+CORPUS_PATH = os.path.join(PERF_DIR, "golden_corpus.ndjson")
+EXPECTED_PATH = os.path.join(PERF_DIR, "golden_expected.json")
+BASELINES_PATH = os.path.join(PERF_DIR, "baselines.json")
+
+CORPUS_SEED = 2026
+CORPUS_SESSIONS = 400
+CORPUS_USER_ID = "00000000-0000-4000-8000-000000000001"
+AGING_AS_OF = date(2026, 4, 1)
+CHUNK_ROWS = 200         # The app aggregates its history page by page (HISTORY_CHUNK_ROWS)
+MERGE_SLICES = 7         # trade_cli --workers aggregates contiguous slices and merges them
+TOLERANCE = 1e-6         # Merged sums add in a different order than one pass
+BENCH_SCALE = 10         # Benchmarks run on the corpus repeated this many times
+BENCH_REPEATS = 7        # Best of this many timed runs
+DEFAULT_THRESHOLD = 0.25  # Fail when a benchmark is this much slower than its baseline
+CALIBRATION_LOOPS = 200_000
+BASELINE_RUNS = 3        # Baselines keep each benchmark's best over this many runs
+
+
+# ── Corpus ───────────────────────────────────────────────────────────
+def _stamp(day: date, rng) -> str:
+    moment = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(seconds=rng.randrange(86400))
+    return moment.isoformat()
+
+
+def _variant(name: str, rng) -> str:
+    """The name as typed: mostly as is, sometimes in another case."""
+    return rng.choice([name] * 6 + [name.upper(), name.lower(), name.title().swapcase()])
+
+
+def _record(rng, role: str, name: str, day: date):
+    entries = [
+        weigh_entry(bags, bags * 100 + rng.choice([0, 12.5, 28.5, 47]), rng.choice([12500, 14000, 15750]),
+                    entry_id=f"e{rng.getrandbits(48):x}")
+        for bags in [rng.randint(1, 12) for _ in range(rng.randint(1, 3))]
+    ]
+    if rng.random() < 0.05:
+        entries = []  # Zero-bag record (e.g. a payment-only line)
+    bags = sum(e["bags"] for e in entries)
+    quintals = sum(e["weightInQuintals"] for e in entries)
+    rate = 25.0 if role == "purchase" else 28.0
+    total = round(sum(e["totalAmount"] for e in entries) + bags * rate, 2)
+    settled = round(total * rng.choice([0, 0, 0.5, 1, 1, rng.random()]), 2)
+    rec = {
+        "id": f"r{rng.getrandbits(64):x}",
+        "date": day.isoformat(),
+        "traderName": name,
+        "entries": entries,
+        "totalBags": bags,
+        "totalWeightInQuintals": round(quintals, 3),
+        "totalAmount": total,
+        "bardhanRate": rate,
+        "bardhanAmount": bags * rate,
+        "amountPaid" if role == "purchase" else "amountReceived": settled,
+        "schemaVersion": 1,
+    }
+    if role == "purchase":
+        rec["linkedSales"] = []
+    else:
+        rec.update(kantaRate=7.5, kantaAmount=bags * 7.5, sourceSeller="")
+    roll = rng.random()
+    if roll < 0.04:
+        rec["date"] = day.strftime("%d/%m/%Y")  # Edited into free text
+    elif roll < 0.06:
+        rec["date"] = ""
+    if rng.random() < 0.1:
+        # Written before the record schema version: fields missing
+        for field in ("schemaVersion", "amountPaid", "amountReceived", "bardhanAmount", "kantaAmount", "linkedSales"):
+            rec.pop(field, None)
+        if rng.random() < 0.3:
+            rec.pop("date")
+        if rng.random() < 0.3:
+            rec.pop("id")
+    return rec
+
+
+def synthetic_corpus(n_sessions: int = CORPUS_SESSIONS, seed: int = CORPUS_SEED):
+    """A seeded synthetic history (newest first) with the messy cases listed in the module docstring."""
+    rng = random.Random(seed)
+    sellers = [f"Seller {i:02d}" for i in range(40)]
+    buyers = [f"Buyer {i:02d}" for i in range(30)]
+    first_day = date(2025, 4, 1)
+    sessions = []
+    for i in range(n_sessions):
+        day = first_day + timedelta(days=i * 365 // n_sessions)
+        created_at = _stamp(day, rng)
+        if sessions and rng.random() < 0.05:
+            created_at = sessions[-1]["created_at"]  # Tie: id decides the order
+        purchases = [
+            _record(rng, "purchase", _variant(rng.choice(sellers), rng), day + timedelta(days=rng.randint(0, 2)))
+            for _ in range(rng.randint(0, 4))
+        ]
+        sales = []
+        for _ in range(rng.randint(0, 3)):
+            sale = _record(rng, "sale", _variant(rng.choice(buyers), rng), day + timedelta(days=rng.randint(0, 3)))
+            roll = rng.random()
+            if roll < 0.05:
+                sale["sourceSeller"] = f"Gone Seller {rng.randint(0, 9)}"  # Dangling
+            elif roll < 0.15:
+                sale["sourceSeller"] = _variant(rng.choice(sellers), rng)  # Maybe only in older sessions
+            elif purchases and roll < 0.85:
+                sale["sourceSeller"] = _variant(rng.choice(purchases)["traderName"], rng)
+            sales.append(sale)
+        if rng.random() < 0.1:
+            purchases, sales = encode_records(purchases), encode_records(sales)
+        sessions.append({
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "user_id": CORPUS_USER_ID,
+            "session_name": f"Session {i:03d}",
+            "created_at": created_at,
+            "updated_at": created_at,
+            "purchases": purchases,
+            "sales": sales,
+        })
+    return history_order(sessions)
+
+
+def history_order(sessions):
+    """created_at descending, then id ascending (the app's history query)."""
+    sessions = sorted(sessions, key=lambda s: s["id"])
+    return sorted(sessions, key=lambda s: s["created_at"], reverse=True)
+
+
+def anonymize(sessions):
+    """Replace trader names, session names and user ids; keeps case variants of one name recognisable."""
+    names = {}
+
+    def pseudonym(name: str) -> str:
+        if not name:
+            return name
+        alias = names.setdefault(name.lower(), f"Trader {len(names):03d}")
+        return alias.upper() if name.isupper() else alias.lower() if name.islower() else alias
+
+    out = []
+    for i, sess in enumerate(sessions):
+        sess = {**sess, "user_id": CORPUS_USER_ID, "session_name": f"Session {i:03d}"}
+        for field in ("purchases", "sales"):
+            sess[field] = [
+                {**rec, "traderName": pseudonym(rec.get("traderName", "")),
+                 **({"sourceSeller": pseudonym(rec["sourceSeller"])} if rec.get("sourceSeller") else {})}
+                for rec in sess.get(field) or []
+            ]
+        for field in ("seller_names", "buyer_names"):
+            if field in sess:
+                sess[field] = [pseudonym(name) for name in sess[field] or []]
+        out.append(sess)
+    return out
+
+
+def read_ndjson(path: str):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        for field in ("purchases", "sales"):
+            if isinstance(row.get(field), str):
+                row[field] = json.loads(row[field])
+    return rows
+
+
+def load_corpus(path: str = CORPUS_PATH):
+    """The corpus as the app holds it after a fetch: records upgraded to the schema version."""
+    return [upgrade_session_records(sess) for sess in read_ndjson(path)]
+
+
+def scaled(sessions, times: int):
+    """The history repeated `times` times with fresh ids, still in history order."""
+    out = []
+    for n in range(times):
+        for sess in sessions:
+            out.append({**sess, "id": f"{sess['id']}-{n}"})
+    return history_order(out)
+
+
+# ── Comparison ───────────────────────────────────────────────────────
+def first_difference(actual, expected, path: str = "$"):
+    """Where two JSON-like values first differ (numbers within TOLERANCE), or None if they match."""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return f"{path}: expected an object, got {type(actual).__name__}"
+        if set(actual) != set(expected):
+            extra, missing = sorted(set(actual) - set(expected)), sorted(set(expected) - set(actual))
+            return f"{path}: keys differ (extra {extra[:5]}, missing {missing[:5]})"
+        for key in expected:
+            diff = first_difference(actual[key], expected[key], f"{path}.{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(expected, (list, tuple)):
+        if not isinstance(actual, (list, tuple)) or len(actual) != len(expected):
+            return f"{path}: expected {len(expected)} items, got {len(actual) if isinstance(actual, (list, tuple)) else actual!r}"
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            diff = first_difference(a, e, f"{path}[{i}]")
+            if diff:
+                return diff
+        return None
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        if isinstance(actual, (int, float)) and abs(actual - expected) <= TOLERANCE * max(1, abs(expected)):
+            return None
+        return f"{path}: expected {expected!r}, got {actual!r}"
+    return None if actual == expected else f"{path}: expected {expected!r}, got {actual!r}"
+
+
+def _json(value):
+    """As stored and served: tuples become lists, keys strings."""
+    return json.loads(json.dumps(value, default=str))
+
+
+# ── Reference output ─────────────────────────────────────────────────
+def reference_output(sessions):
+    """What the golden file stores: aggregate stats and every trader's ledger rows."""
+    stats = get_aggregate_stats(sessions)
+    return _json({
+        "stats": stats,
+        "ledgers": {
+            role: {name: trader_records(sessions, name, role) for name in stats[group]}
+            for role, group in (("seller", "sellers"), ("buyer", "buyers"))
+        },
+    })
+
+
+def reference_aging(sessions, role: str, as_of: date):
+    """AgingIndex.report() computed by scanning every record (what the index replaces)."""
+    field, paid = ("purchases", "amountPaid") if role == "seller" else ("sales", "amountReceived")
+    names, totals = {}, {}
+    for sess in sessions:
+        for rec in sess.get(field, []):
+            outstanding = rec.get("totalAmount", 0) - rec.get(paid, 0)
+            day = record_day(rec, sess)
+            if outstanding <= SETTLED_EPSILON or day is None or day > as_of:
+                continue
+            key = rec.get("traderName", "Unknown").lower()
+            names.setdefault(key, rec.get("traderName", "Unknown"))
+            age = (as_of - day).days
+            label = next(
+                label for label, lo, hi in AGING_BUCKETS if age >= lo and (hi is None or age <= hi)
+            )
+            buckets = totals.setdefault(key, {label: 0.0 for label, _, _ in AGING_BUCKETS})
+            buckets[label] += outstanding
+    rows = []
+    for key, buckets in totals.items():
+        total = sum(buckets.values())
+        if total > SETTLED_EPSILON:
+            rows.append({"Trader": names[key], **buckets, "Total": total})
+    rows.sort(key=lambda r: r["Total"], reverse=True)
+    return rows
+
+
+# ── Fast paths ───────────────────────────────────────────────────────
+def chunked_stats(sessions):
+    """The app's load path: one builder fed page by page as the history arrives."""
+    builder = AggregateBuilder()
+    for start in range(0, len(sessions), CHUNK_ROWS):
+        builder.add_sessions(sessions[start:start + CHUNK_ROWS])
+    return builder.result()
+
+
+def merged_stats(sessions, slices: int = MERGE_SLICES):
+    """trade_cli --workers: a builder per contiguous slice, merged in history order."""
+    bounds = [len(sessions) * i // slices for i in range(slices + 1)]
+    builders = []
+    for start, stop in zip(bounds, bounds[1:]):
+        builder = AggregateBuilder()
+        builder.add_sessions(sessions[start:stop])
+        builders.append(builder)
+    merged = builders[0]
+    for builder in builders[1:]:
+        merged.merge(builder)
+    return merged.result()
+
+
+def feed_history(sessions, seed: int = CORPUS_SEED):
+    """The history rebuilt from change-feed events arriving in random order, with updates and deletes."""
+    rng = random.Random(seed)
+    events = [{"type": "INSERT", "record": copy.deepcopy(s), "old_record": {}} for s in sessions]
+    rng.shuffle(events)
+    rows = []
+    for i, event in enumerate(events):
+        rows = apply_change(rows, event)
+        if i % 17 == 0:
+            # Delete a row then have it re-inserted; update another in place
+            victim = rng.choice(rows)
+            rows = apply_change(rows, {"type": "DELETE", "record": {}, "old_record": {"id": victim["id"]}})
+            rows = apply_change(rows, {"type": "INSERT", "record": victim, "old_record": {}})
+            again = rng.choice(rows)
+            rows = apply_change(rows, {"type": "UPDATE", "record": copy.deepcopy(again), "old_record": {}})
+    return rows
+
+
+def cache_roundtrip(value):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SharedCache(os.path.join(tmp, "gate.sqlite3"))
+        cache.set("aggregate_stats", CORPUS_USER_ID, "gate", value)
+        return cache.get("aggregate_stats", CORPUS_USER_ID, "gate")
+
+
+def codec_roundtrip(sessions):
+    return [
+        {**sess, "purchases": decode_records(encode_records(sess["purchases"])),
+         "sales": decode_records(encode_records(sess["sales"]))}
+        for sess in sessions
+    ]
+
+
+def _entries_without_ids(sessions):
+    """Decoded entries as compared after a codec round trip (entry ids aren't encoded)."""
+    return [
+        [{k: v for k, v in e.items() if k != "id"} for e in decode_records([rec])[0]["entries"]]
+        for sess in sessions for field in ("purchases", "sales") for rec in sess[field]
+    ]
+
+
+def differential_checks(sessions):
+    """[(name, difference or None)] of every fast path against the reference on `sessions`."""
+    reference = _json(get_aggregate_stats(sessions))
+    checks = [
+        ("chunked aggregation", lambda: first_difference(_json(chunked_stats(sessions)), reference)),
+        ("merged slice aggregation", lambda: first_difference(_json(merged_stats(sessions)), reference)),
+        ("shared cache round trip", lambda: first_difference(cache_roundtrip(reference), reference)),
+    ]
+
+    def feed():
+        rows = feed_history(sessions)
+        order = first_difference([r["id"] for r in rows], [s["id"] for s in sessions], "$.order")
+        return order or first_difference(_json(get_aggregate_stats(rows)), reference)
+
+    def codec():
+        decoded = codec_roundtrip(sessions)
+        entries = first_difference(_entries_without_ids(decoded), _entries_without_ids(sessions), "$.entries")
+        return entries or first_difference(_json(get_aggregate_stats(decoded)), reference)
+
+    def ledgers():
+        for role in ("seller", "buyer"):
+            fast = trader_ledgers(sessions, role)
+            slow = {name: trader_records(sessions, name, role) for name in fast}
+            diff = first_difference(_json(fast), _json(slow), f"$.{role}")
+            if diff:
+                return diff
+            known = {name.lower() for name in fast}
+            group = "sellers" if role == "seller" else "buyers"
+            if known != {name.lower() for name in reference[group]}:
+                return f"$.{role}: traders differ from the aggregate's"
+        return None
+
+    def aging():
+        index = AgingIndex.from_sessions(sessions)
+        for role in ("seller", "buyer"):
+            diff = first_difference(
+                _json(index.report(role, AGING_AS_OF)), _json(reference_aging(sessions, role, AGING_AS_OF)),
+                f"$.{role}",
+            )
+            if diff:
+                return diff
+        return None
+
+    def ranged():
+        for start in (date(2025, 4, 1), date(2025, 10, 1), date(2026, 1, 1)):
+            date_range = (start, start + timedelta(days=89))
+            sliced = slice_sessions(sessions, date_range)
+            diff = first_difference(
+                _json(chunked_stats(sliced)), _json(get_aggregate_stats(sliced)),
+                f"$.{start.isoformat()}",
+            )
+            if diff:
+                return diff
+        return None
+
+    checks += [
+        ("change feed application", feed),
+        ("record codec round trip", codec),
+        ("trader_ledgers vs trader_records", ledgers),
+        ("AgingIndex vs full scan", aging),
+        ("date-range chunked aggregation", ranged),
+    ]
+    results = []
+    for name, check in checks:
+        try:
+            results.append((name, check()))
+        except Exception as e:
+            results.append((name, f"raised {type(e).__name__}: {e}"))
+    return results
+
+
+# ── Benchmarks ───────────────────────────────────────────────────────
+def _calibration():
+    total = 0
+    table = {}
+    for i in range(CALIBRATION_LOOPS):
+        table[i % 997] = table.get(i % 997, 0) + i
+        total += i & 7
+    return total
+
+
+def _benchmarks(sessions):
+    """name -> (setup, fn): fn(setup()) is timed; setup isn't."""
+    raw = [{**s, "purchases": [{k: v for k, v in r.items() if k != "schemaVersion"} for r in s["purchases"]],
+            "sales": [{k: v for k, v in r.items() if k != "schemaVersion"} for r in s["sales"]]} for s in sessions]
+    compact = [{**s, "purchases": encode_records(s["purchases"]), "sales": encode_records(s["sales"])} for s in sessions]
+    stats = get_aggregate_stats(sessions)
+    traders = sorted(stats["sellers"])[:10]
+    cache_dir = tempfile.mkdtemp()
+    cache = SharedCache(os.path.join(cache_dir, "bench.sqlite3"))
+    cache.set("aggregate_stats", CORPUS_USER_ID, "bench", stats)
+    updates = [{"type": "UPDATE", "record": copy.deepcopy(s), "old_record": {}} for s in sessions[::len(sessions) // 50]]
+    season = (date(2025, 10, 1), date(2025, 12, 29))
+
+    def apply_updates(rows):
+        for event in updates:
+            rows = apply_change(rows, event)
+        return rows
+
+    return {
+        "calibration": (lambda: None, lambda _: _calibration()),
+        "get_aggregate_stats": (lambda: sessions, get_aggregate_stats),
+        "aggregate_merged_slices": (lambda: sessions, merged_stats),
+        "upgrade_session_records": (
+            lambda: [{**s, "purchases": list(s["purchases"]), "sales": list(s["sales"])} for s in raw],
+            lambda rows: [upgrade_session_records(r) for r in rows],
+        ),
+        "slice_sessions": (lambda: sessions, lambda rows: slice_sessions(rows, season)),
+        "trader_ledgers": (lambda: sessions, lambda rows: (trader_ledgers(rows, "seller"), trader_ledgers(rows, "buyer"))),
+        "trader_records_x10": (lambda: sessions, lambda rows: [trader_records(rows, t, "seller") for t in traders]),
+        "aging_index": (lambda: sessions, lambda rows: AgingIndex.from_sessions(rows).report("seller", AGING_AS_OF)),
+        "decode_records": (lambda: compact, lambda rows: [decode_records(s["purchases"] + s["sales"]) for s in rows]),
+        "change_feed_updates_x50": (lambda: list(sessions), apply_updates),
+        "shared_cache_get": (lambda: None, lambda _: cache.get("aggregate_stats", CORPUS_USER_ID, "bench")),
+    }
+
+
+def run_benchmarks(sessions, repeats: int = BENCH_REPEATS, only=None):
+    """name -> best wall time in ms (of the benchmarks named in `only`, default all)."""
+    results = {}
+    for name, (setup, fn) in _benchmarks(sessions).items():
+        if only is not None and name not in only:
+            continue
+        fn(setup())  # Warm up
+        best = float("inf")
+        for _ in range(repeats):
+            arg = setup()
+            gc.collect()
+            gc.disable()  # As timeit does: a collection mid-run is noise
+            try:
+                started = time.perf_counter()
+                fn(arg)
+                best = min(best, time.perf_counter() - started)
+            finally:
+                gc.enable()
+        results[name] = round(best * 1000, 3)
+    return results
+
+
+def compare_benchmarks(results, baselines, threshold: float):
+    """[(name, ms, allowed ms or None, failed)] with baselines scaled by the calibration ratio."""
+    base = baselines.get("results", {})
+    scale = results["calibration"] / base["calibration"] if base.get("calibration") else 1.0
+    rows = []
+    for name, ms in results.items():
+        if name == "calibration":
+            continue
+        limit = baselines.get("thresholds", {}).get(name, threshold)
+        allowed = base[name] * scale * (1 + limit) if name in base else None
+        rows.append((name, ms, allowed, allowed is not None and ms > allowed))
+    return rows, scale
+
+
+# ── Commands ─────────────────────────────────────────────────────────
+def write_json(path: str, value, indent=1):
+    with open(path, "w") as f:
+        json.dump(value, f, indent=indent, sort_keys=True)
+        f.write("\n")
+
+
+def check(args) -> bool:
+    sessions = load_corpus(args.corpus)
+    ok = True
+    print(f"Golden corpus: {len(sessions)} sessions, "
+          f"{sum(len(s['purchases']) + len(s['sales']) for s in sessions)} records")
+
+    with open(args.expected) as f:
+        expected = json.load(f)
+    diff = first_difference(reference_output(sessions), expected)
+    print(f"  {'FAIL' if diff else 'ok  '} reference output matches {os.path.relpath(args.expected)}")
+    if diff:
+        print(f"       {diff}")
+        ok = False
+
+    for name, diff in differential_checks(sessions):
+        print(f"  {'FAIL' if diff else 'ok  '} {name}")
+        if diff:
+            print(f"       {diff}")
+            ok = False
+
+    if args.skip_bench:
+        return ok
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+    bench_sessions = scaled(sessions, BENCH_SCALE)
+    results = run_benchmarks(bench_sessions)
+    # Timed again at the end, so a busy spell during the first doesn't skew every limit
+    results["calibration"] = min(results["calibration"], run_benchmarks(bench_sessions, only={"calibration"})["calibration"])
+    rows, scale = compare_benchmarks(results, baselines, args.threshold)
+    slow = [name for name, _, _, failed in rows if failed]
+    if slow:
+        # A busy machine slows single runs; only a slowdown that persists counts
+        for name, ms in run_benchmarks(bench_sessions, BENCH_REPEATS * 2, only=slow).items():
+            results[name] = min(results[name], ms)
+        rows, scale = compare_benchmarks(results, baselines, args.threshold)
+    print(f"Benchmarks (corpus x{BENCH_SCALE}, best of {BENCH_REPEATS}; this machine is {scale:.2f}x the baseline's):")
+    for name, ms, allowed, failed in rows:
+        limit = f"limit {allowed:9.3f} ms" if allowed is not None else "no baseline"
+        print(f"  {'FAIL' if failed else 'ok  '} {name:<26}{ms:10.3f} ms   {limit}")
+        ok = ok and not failed
+    if args.json:
+        write_json(args.json, {"scale": scale, "results": results, "ok": ok})
+    return ok
+
+
+def update_baselines(args):
+    sessions = load_corpus(args.corpus)
+    previous = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            previous = json.load(f)
+    bench_sessions = scaled(sessions, BENCH_SCALE)
+    runs = [run_benchmarks(bench_sessions) for _ in range(BASELINE_RUNS)]
+    results = {name: min(run[name] for run in runs) for name in runs[0]}
+    write_json(args.baselines, {
+        "recorded_on": {"python": platform.python_version(), "machine": platform.machine(),
+                        "date": date.today().isoformat()},
+        "results": results,
+        # Per-benchmark overrides of --threshold, kept across updates
+        "thresholds": previous.get("thresholds", {}),
+    })
+    print(f"Wrote {len(results)} baselines to {args.baselines}")
+
+
+def update_golden(args):
+    write_json(args.expected, reference_output(load_corpus(args.corpus)), indent=None)
+    print(f"Wrote reference output to {args.expected}")
+
+
+def build_corpus(args):
+    sessions = anonymize(history_order(read_ndjson(args.from_dump))) if args.from_dump else synthetic_corpus()
+    os.makedirs(os.path.dirname(args.corpus), exist_ok=True)
+    with open(args.corpus, "w") as f:
+        for sess in sessions:
+            f.write(json.dumps(sess, sort_keys=True) + "\n")
+    print(f"Wrote {len(sessions)} sessions to {args.corpus}; run update-golden next")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Golden, differential and benchmark gate for the trade computations")
+    parser.add_argument("command", nargs="?", default="check",
+                        choices=("check", "update-baselines", "update-golden", "build-corpus"))
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--expected", default=EXPECTED_PATH)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown over a baseline (0.25 = 25%%)")
+    parser.add_argument("--skip-bench", action="store_true", help="correctness checks only")
+    parser.add_argument("--from-dump", help="build-corpus: anonymize this NDJSON dump instead of generating one")
+    parser.add_argument("--json", help="check: also write the benchmark results here")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        sys.exit(0 if check(args) else 1)
+    {"update-baselines": update_baselines, "update-golden": update_golden, "build-corpus": build_corpus}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
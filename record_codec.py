@@ -0,0 +1,110 @@
+import json
+import time
+
+CODEC_VERSION = 1
+ENTRY_FIELDS = {"id", "bags", "weight", "weightInQuintals", "ratePerQuintal", "totalAmount"}
+
+
+def parse_weight_to_quintals(weight: float) -> float:
+    """Parse weight format: 528.5 = 5 quintals + 28.5 kgs"""
+    quintals = int(weight // 100)
+    kgs = weight % 100
+    return quintals + (kgs / 100)
+
+
+def derive_entry(bags, weight, rate) -> dict:
+    """A weigh entry's stored fields, computed the way the entry forms compute them."""
+    wq = parse_weight_to_quintals(weight)
+    return {
+        "bags": bags,
+        "weight": weight,
+        "weightInQuintals": round(wq, 3),
+        "ratePerQuintal": rate,
+        "totalAmount": round(wq * rate, 2),
+    }
+
+
+def is_compact(entries) -> bool:
+    return isinstance(entries, dict) and "_v" in entries
+
+
+def encode_entries(entries):
+    """Column form {"_v", "bags", "weight", "rate"} of a record's entries.
+
+    Returns None when the entries wouldn't decode back to the same values
+    (extra fields, or derived fields that don't match weight and rate),
+    so such records are simply left verbose. Entry ids are not kept.
+    """
+    if not isinstance(entries, list):
+        return None
+    cols = {"_v": CODEC_VERSION, "bags": [], "weight": [], "rate": []}
+    for e in entries:
+        if not isinstance(e, dict) or set(e) - ENTRY_FIELDS:
+            return None
+        try:
+            derived = derive_entry(e["bags"], e["weight"], e["ratePerQuintal"])
+        except (KeyError, TypeError):
+            return None
+        if any(e.get(k) != v for k, v in derived.items()):
+            return None
+        cols["bags"].append(e["bags"])
+        cols["weight"].append(e["weight"])
+        cols["rate"].append(e["ratePerQuintal"])
+    return cols
+
+
+def decode_entries(cols, record_id) -> list:
+    """Verbose entries from their column form; ids are derived from the record id."""
+    if cols["_v"] != CODEC_VERSION:
+        raise ValueError(f"Unsupported record codec version {cols['_v']}")
+    return [
+        {"id": f"{record_id}:{i}", **derive_entry(bags, weight, rate)}
+        for i, (bags, weight, rate) in enumerate(zip(cols["bags"], cols["weight"], cols["rate"]))
+    ]
+
+
+def encode_records(records) -> list:
+    """Records with their entries in column form where that is lossless."""
+    out = []
+    for rec in records:
+        cols = encode_entries(rec.get("entries"))
+        out.append({**rec, "entries": cols} if cols is not None else rec)
+    return out
+
+
+def decode_records(records) -> list:
+    """Records with verbose entries; already-verbose records are returned as they are."""
+    return [
+        {**rec, "entries": decode_entries(rec["entries"], rec.get("id"))} if is_compact(rec.get("entries")) else rec
+        for rec in records
+    ]
+
+
+def codec_report(sessions) -> dict:
+    """Payload size and parse time of `sessions` in both encodings."""
+    verbose = [decode_records(sess.get(field, [])) for sess in sessions for field in ("purchases", "sales")]
+    compact = [encode_records(records) for records in verbose]
+    verbose_json = json.dumps(verbose)
+    compact_json = json.dumps(compact)
+
+    started = time.perf_counter()
+    json.loads(verbose_json)
+    verbose_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    loaded = json.loads(compact_json)
+    compact_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for records in loaded:
+        decode_records(records)
+    decode_ms = (time.perf_counter() - started) * 1000
+
+    # Aggregates only read record-level fields, so they pay the parse but
+    # never the decode; opening a session decodes just that session
+    return {
+        "records": sum(len(records) for records in verbose),
+        "verbose_bytes": len(verbose_json),
+        "compact_bytes": len(compact_json),
+        "verbose_parse_ms": round(verbose_ms, 2),
+        "compact_parse_ms": round(compact_ms, 2),
+        "compact_decode_ms": round(decode_ms, 2),
+    }
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "chilli_tracker_cache.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+TOUCH_INTERVAL_SECONDS = 5  # Don't rewrite accessed_at on every single hit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace   TEXT NOT NULL,
+    user_id     TEXT NOT NULL,
+    version     TEXT NOT NULL,
+    value       BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, user_id, version)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries(accessed_at);
+"""
+
+
+class SharedCache:
+    """Size-bounded cache shared by every app process on this host.
+
+    Entries are keyed by (namespace, user_id, data version) and stored as
+    zlib-compressed JSON in a SQLite database in WAL mode, so readers never
+    block the single writer and all workers see each other's results. When
+    the total size exceeds `max_bytes`, least recently used entries go first.
+    A cache failure never breaks a request: errors are logged and reported
+    as a miss.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, user_id, version: str):
+        """Return the cached value, or None on a miss."""
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, accessed_at FROM cache_entries WHERE namespace = ? AND user_id = ? AND version = ?",
+                (namespace, str(user_id), version),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND user_id = ? AND version = ?",
+                    (now, namespace, str(user_id), version),
+                )
+            return json.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            logger.warning("Shared cache read failed: %s", e)
+            return None
+
+    def set(self, namespace: str, user_id, version: str, value):
+        """Store a value, dropping older versions for the same user and namespace."""
+        try:
+            blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+            if len(blob) > self.max_bytes:
+                return
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND user_id = ? AND version != ?",
+                    (namespace, str(user_id), version),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, str(user_id), version, blob, len(blob), time.time()),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for namespace, user_id, version, size in conn.execute(
+            "SELECT namespace, user_id, version, size FROM cache_entries ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND user_id = ? AND version = ?",
+                (namespace, user_id, version),
+            )
+            total -= size
+
+    def stats(self) -> dict:
+        """Entry count and total stored bytes."""
+        try:
+            count, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+            return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+        except Exception as e:
+            logger.warning("Shared cache stats failed: %s", e)
+            return {}
@@ -0,0 +1,59 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs `fn`; callers arriving while it is still
+    in flight wait and receive the same result (or exception). Nothing is
+    cached once the call completes. Keys are tuples whose first item names
+    the operation, which is what the counters are grouped by.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}     # key -> _Call
+        self._counters = {}  # operation -> {calls, executed, deduplicated}
+
+    def do(self, key: tuple, fn):
+        with self._lock:
+            counts = self._counters.setdefault(key[0], {"calls": 0, "executed": 0, "deduplicated": 0})
+            counts["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counts["executed"] += 1
+            else:
+                counts["deduplicated"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def counters(self) -> dict:
+        """Per-operation call counts, including how many were deduplicated."""
+        with self._lock:
+            return {op: dict(c) for op, c in self._counters.items()}
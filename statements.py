@@ -0,0 +1,203 @@
+import csv
+import io
+import multiprocessing
+import os
+import re
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from trade_core import trader_ledgers, trader_statement
+
+# Per-trader statements as CSV and PDF, rendered on a process pool and
+# bundled into one zip. Used by the Sellers/Buyers tabs and trade_cli.py.
+
+ROLE_FOLDERS = {"seller": "sellers", "buyer": "buyers"}
+PDF_LINES_PER_PAGE = 70
+PDF_FONT_SIZE = 8
+PDF_LINE_HEIGHT = 10.5
+PDF_MARGIN = 40
+PDF_PAGE = (595, 842)  # A4 in points
+MIN_STATEMENTS_PER_WORKER = 100  # Smaller batches render faster in-process than a pool starts
+
+
+def build_statements(sessions, roles=("seller", "buyer"), traders=None, opening_balances=()):
+    """[(role, trader, statement)] for every trader of `roles`, or only those named in `traders`.
+
+    Each trader's carried-forward balance from `opening_balances` opens
+    their statement; a trader with only an opening balance gets one too.
+    """
+    wanted = {t.lower() for t in traders} if traders else None
+    out = []
+    for role in roles:
+        ledgers = trader_ledgers(sessions, role)
+        display = {name.lower(): name for name in ledgers}
+        opening = {}
+        for ob in opening_balances:
+            if ob["role"] == role:
+                opening[ob["trader_key"]] = ob
+                ledgers.setdefault(display.setdefault(ob["trader_key"], ob["trader_name"]), [])
+        for name, records in ledgers.items():
+            if wanted is None or name.lower() in wanted:
+                out.append((role, name, trader_statement(records, role, opening.get(name.lower()))))
+    return out
+
+
+def _settled_label(role: str) -> str:
+    return "Paid" if role == "seller" else "Received"
+
+
+def statement_csv(role: str, trader: str, statement: dict) -> str:
+    settled = _settled_label(role)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Date", "Session", "Bags", "Amount", settled, "Pending", "Balance"])
+    for r in statement["rows"]:
+        writer.writerow([
+            r["date"], r["session_name"], r["bags"], f"{r['amount']:.2f}",
+            f"{r[settled.lower()]:.2f}", f"{r['pending']:.2f}", f"{r['balance']:.2f}",
+        ])
+    writer.writerow([
+        "Total", "", statement["bags"], f"{statement['amount']:.2f}",
+        f"{statement[settled.lower()]:.2f}", f"{statement['pending']:.2f}", "",
+    ])
+    return out.getvalue()
+
+
+def _pdf_text(text: str) -> str:
+    text = text.replace("₹", "Rs.").encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def statement_lines(role: str, trader: str, statement: dict, as_of: date) -> list:
+    """The statement as fixed-width text lines (the PDF is set in Courier)."""
+    settled = _settled_label(role)
+    lines = [
+        f"Statement of account - {role.title()}: {trader}",
+        f"As of {as_of.isoformat()}",
+        "",
+        f"{'Date':<12}{'Session':<24}{'Bags':>6}{'Amount':>14}{settled:>14}{'Pending':>13}{'Balance':>14}",
+        "-" * 97,
+    ]
+    for r in statement["rows"]:
+        lines.append(
+            f"{str(r['date'])[:11]:<12}{str(r['session_name'])[:23]:<24}{r['bags']:>6}{r['amount']:>14.2f}"
+            f"{r[settled.lower()]:>14.2f}{r['pending']:>13.2f}{r['balance']:>14.2f}"
+        )
+    lines += [
+        "-" * 97,
+        f"{'Total':<36}{statement['bags']:>6}{statement['amount']:>14.2f}"
+        f"{statement[settled.lower()]:>14.2f}{statement['pending']:>13.2f}",
+    ]
+    return lines
+
+
+def text_pdf(lines) -> bytes:
+    """A minimal PDF of monospaced text lines, paginated."""
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    width, height = PDF_PAGE
+    # 1: catalog, 2: page tree, 3: font, then a page and its content stream per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for n, page in enumerate(pages):
+        ops = [f"BT /F1 {PDF_FONT_SIZE} Tf {PDF_LINE_HEIGHT} TL {PDF_MARGIN} {height - PDF_MARGIN} Td"]
+        ops += [f"({_pdf_text(line)}) '" for line in page]
+        ops.append(f"ET BT /F1 {PDF_FONT_SIZE} Tf {width - PDF_MARGIN - 60} {PDF_MARGIN / 2} Td "
+                   f"(Page {n + 1} of {len(pages)}) Tj ET")
+        stream = "\n".join(ops).encode("latin-1")
+        page_no = len(objects) + 1
+        kids.append(f"{page_no} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_no + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def render_statement(task):
+    """(role, trader, csv text, pdf bytes) for one (role, trader, statement, as_of) task; runs in a worker."""
+    role, trader, statement, as_of = task
+    return (
+        role, trader,
+        statement_csv(role, trader, statement),
+        text_pdf(statement_lines(role, trader, statement, as_of)),
+    )
+
+
+def _file_stem(name: str, taken: set) -> str:
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", ascii_name).strip("._") or "trader"
+    candidate, n = stem, 2
+    while candidate.lower() in taken:
+        candidate, n = f"{stem}_{n}", n + 1
+    taken.add(candidate.lower())
+    return candidate
+
+
+def statements_zip(statements, workers=None, as_of: date = None, on_progress=None) -> bytes:
+    """Zip of sellers/<name>.csv|.pdf, buyers/<name>.csv|.pdf and a summary.csv.
+
+    Rendering runs on up to `workers` processes (default: one per CPU),
+    at least MIN_STATEMENTS_PER_WORKER statements each; 1 renders
+    in-process. `on_progress(done, total)` is called as statements finish.
+    """
+    as_of = as_of or date.today()
+    tasks = [(role, trader, statement, as_of) for role, trader, statement in statements]
+    total = len(tasks)
+    workers = min(workers or os.cpu_count() or 1, -(-total // MIN_STATEMENTS_PER_WORKER))
+
+    buf = io.BytesIO()
+    taken = {folder: set() for folder in ROLE_FOLDERS.values()}
+    stems = {}  # (role, trader) -> path in the zip, without extension
+    summary = io.StringIO()
+    summary_writer = csv.writer(summary)
+    summary_writer.writerow(["Role", "Trader", "Records", "Bags", "Amount", "Paid/Received", "Pending", "File"])
+
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        def add(result, done):
+            role, trader, csv_text, pdf = result
+            folder = ROLE_FOLDERS[role]
+            stem = stems[role, trader] = f"{folder}/{_file_stem(trader, taken[folder])}"
+            zf.writestr(f"{stem}.csv", csv_text)
+            zf.writestr(f"{stem}.pdf", pdf)
+            if on_progress:
+                on_progress(done, total)
+
+        if workers > 1:
+            # Spawned, not forked: the app server has threads running
+            ctx = multiprocessing.get_context("spawn")
+            chunksize = max(1, total // (workers * 8))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                for done, result in enumerate(pool.map(render_statement, tasks, chunksize=chunksize), 1):
+                    add(result, done)
+        else:
+            for done, task in enumerate(tasks, 1):
+                add(render_statement(task), done)
+
+        for role, trader, statement in statements:
+            settled = "paid" if role == "seller" else "received"
+            summary_writer.writerow([
+                role, trader, len(statement["rows"]), statement["bags"], f"{statement['amount']:.2f}",
+                f"{statement[settled]:.2f}", f"{statement['pending']:.2f}", f"{stems[role, trader]}.pdf",
+            ])
+        zf.writestr("summary.csv", summary.getvalue())
+    return buf.getvalue()
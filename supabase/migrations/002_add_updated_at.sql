@@ -0,0 +1,29 @@
+-- Migration: Track when each trade session was last modified
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- The app derives a per-user data version from (row count, max updated_at).
+-- Caches shared between server processes are keyed by that version, so any
+-- insert, update or delete by any worker invalidates them.
+
+ALTER TABLE trade_sessions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- Existing rows: last known modification is their creation
+UPDATE trade_sessions SET updated_at = created_at;
+
+-- Keep updated_at current on every update
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = clock_timestamp();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trade_sessions_set_updated_at ON trade_sessions;
+CREATE TRIGGER trade_sessions_set_updated_at
+  BEFORE UPDATE ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION set_updated_at();
+
+-- Index for the cheap "latest change" version lookup
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_user_updated_at ON trade_sessions(user_id, updated_at DESC);
@@ -0,0 +1,104 @@
+-- Migration: Indexed per-trader ledger lookups
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- Trader names are free text and matched case-insensitively, which jsonb
+-- containment (@>) can't do. Every purchase/sale record therefore carries a
+-- `traderKey` (lower-cased traderName), maintained by a trigger, and the GIN
+-- jsonb_path_ops indexes answer "sessions containing trader X" directly.
+
+-- Keep traderKey in sync on every write, whichever client made it
+CREATE OR REPLACE FUNCTION with_trader_keys(records JSONB)
+RETURNS JSONB AS $$
+  SELECT COALESCE(
+    jsonb_agg(
+      CASE WHEN jsonb_typeof(r) = 'object'
+        THEN r || jsonb_build_object('traderKey', lower(COALESCE(r->>'traderName', 'Unknown')))
+        ELSE r
+      END
+      ORDER BY ord
+    ),
+    '[]'::jsonb
+  )
+  FROM jsonb_array_elements(COALESCE(records, '[]'::jsonb)) WITH ORDINALITY AS e(r, ord);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION set_trader_keys()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.purchases = with_trader_keys(NEW.purchases);
+  NEW.sales = with_trader_keys(NEW.sales);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trade_sessions_set_trader_keys ON trade_sessions;
+CREATE TRIGGER trade_sessions_set_trader_keys
+  BEFORE INSERT OR UPDATE OF purchases, sales ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION set_trader_keys();
+
+-- Backfill existing rows
+UPDATE trade_sessions
+SET purchases = with_trader_keys(purchases),
+    sales = with_trader_keys(sales);
+
+-- Containment indexes on the record arrays
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_purchases ON trade_sessions USING GIN (purchases jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_sales ON trade_sessions USING GIN (sales jsonb_path_ops);
+
+-- Flattened records of one trader, in the same order as the app's
+-- get_trader_records(): newest session first, then record order.
+-- p_role is 'seller' (purchases) or 'buyer' (sales). Runs with the caller's
+-- rights, so row level security still applies.
+CREATE OR REPLACE FUNCTION get_trader_ledger(p_trader TEXT, p_role TEXT)
+RETURNS TABLE (
+  session_id UUID,
+  session_name TEXT,
+  record_id TEXT,
+  date TEXT,
+  bags NUMERIC,
+  amount NUMERIC,
+  paid NUMERIC,
+  received NUMERIC,
+  pending NUMERIC,
+  source_seller TEXT
+)
+LANGUAGE plpgsql STABLE SECURITY INVOKER
+AS $$
+DECLARE
+  trader_key TEXT := lower(p_trader);
+  probe JSONB := jsonb_build_array(jsonb_build_object('traderKey', lower(p_trader)));
+BEGIN
+  IF p_role = 'seller' THEN
+    RETURN QUERY
+    SELECT s.id, s.session_name, r->>'id', COALESCE(r->>'date', ''),
+           COALESCE((r->>'totalBags')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0),
+           COALESCE((r->>'amountPaid')::numeric, 0),
+           COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0) - COALESCE((r->>'amountPaid')::numeric, 0),
+           ''::text
+    FROM trade_sessions s
+    CROSS JOIN LATERAL jsonb_array_elements(s.purchases) WITH ORDINALITY AS e(r, ord)
+    WHERE s.user_id = auth.uid()
+      AND s.purchases @> probe
+      AND r->>'traderKey' = trader_key
+    ORDER BY s.created_at DESC, e.ord;
+  ELSE
+    RETURN QUERY
+    SELECT s.id, s.session_name, r->>'id', COALESCE(r->>'date', ''),
+           COALESCE((r->>'totalBags')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0),
+           COALESCE((r->>'amountPaid')::numeric, 0),
+           COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0) - COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE(r->>'sourceSeller', '')
+    FROM trade_sessions s
+    CROSS JOIN LATERAL jsonb_array_elements(s.sales) WITH ORDINALITY AS e(r, ord)
+    WHERE s.user_id = auth.uid()
+      AND s.sales @> probe
+      AND r->>'traderKey' = trader_key
+    ORDER BY s.created_at DESC, e.ord;
+  END IF;
+END;
+$$;
@@ -0,0 +1,57 @@
+-- Migration: Per-session summary columns
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- The app writes these alongside purchases/sales on every save and bulk
+-- edit, so listing, searching and sorting sessions never has to read the
+-- JSONB payload.
+
+ALTER TABLE trade_sessions
+  ADD COLUMN IF NOT EXISTS total_bags_purchased INTEGER DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS total_bags_sold INTEGER DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS seller_names TEXT[] DEFAULT '{}',
+  ADD COLUMN IF NOT EXISTS buyer_names TEXT[] DEFAULT '{}',
+  ADD COLUMN IF NOT EXISTS purchase_count INTEGER DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS sale_count INTEGER DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS first_trade_date DATE,
+  ADD COLUMN IF NOT EXISTS last_trade_date DATE;
+
+-- Record dates are free text (editable in the trader views); anything that
+-- isn't a valid ISO date is ignored rather than failing the statement
+CREATE OR REPLACE FUNCTION safe_date(value TEXT)
+RETURNS DATE AS $$
+BEGIN
+  IF value ~ '^\d{4}-\d{2}-\d{2}$' THEN
+    RETURN value::date;
+  END IF;
+  RETURN NULL;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Backfill existing rows
+UPDATE trade_sessions s
+SET total_bags_purchased = COALESCE((
+      SELECT SUM(COALESCE((p->>'totalBags')::numeric, 0))::integer
+      FROM jsonb_array_elements(s.purchases) p), 0),
+    total_bags_sold = COALESCE((
+      SELECT SUM(COALESCE((r->>'totalBags')::numeric, 0))::integer
+      FROM jsonb_array_elements(s.sales) r), 0),
+    seller_names = ARRAY(
+      SELECT DISTINCT p->>'traderName'
+      FROM jsonb_array_elements(s.purchases) p
+      WHERE p->>'traderName' IS NOT NULL),
+    buyer_names = ARRAY(
+      SELECT DISTINCT r->>'traderName'
+      FROM jsonb_array_elements(s.sales) r
+      WHERE r->>'traderName' IS NOT NULL),
+    purchase_count = jsonb_array_length(s.purchases),
+    sale_count = jsonb_array_length(s.sales),
+    first_trade_date = (
+      SELECT MIN(safe_date(x->>'date')) FROM jsonb_array_elements(s.purchases || s.sales) x),
+    last_trade_date = (
+      SELECT MAX(safe_date(x->>'date')) FROM jsonb_array_elements(s.purchases || s.sales) x);
+
+-- Trader name lookups over the summary arrays
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_seller_names ON trade_sessions USING GIN (seller_names);
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_buyer_names ON trade_sessions USING GIN (buyer_names);
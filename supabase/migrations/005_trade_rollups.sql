@@ -0,0 +1,151 @@
+-- Migration: Daily and monthly rollups of purchase/sale records
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- One row per (user, bucket, role, trader). trader_key is the lower-cased
+-- trader name, or '*' for the all-traders total, so a multi-year monthly
+-- trend reads a few dozen rows. Rows are maintained incrementally by a
+-- trigger on trade_sessions: each write subtracts the old payload's
+-- contribution and adds the new one. Records without a valid ISO date are
+-- not bucketed.
+--
+-- Weighted average rate per quintal = goods_amount / quintals, where
+-- goods_amount is the record total less bardhan and kanta (the sum of
+-- weight x rate over its entries).
+
+CREATE TABLE IF NOT EXISTS trade_rollups_daily (
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  bucket DATE NOT NULL,
+  role TEXT NOT NULL CHECK (role IN ('purchase', 'sale')),
+  trader_key TEXT NOT NULL,
+  record_count INTEGER NOT NULL DEFAULT 0,
+  bags NUMERIC NOT NULL DEFAULT 0,
+  quintals NUMERIC NOT NULL DEFAULT 0,
+  goods_amount NUMERIC NOT NULL DEFAULT 0,
+  amount NUMERIC NOT NULL DEFAULT 0,
+  bardhan NUMERIC NOT NULL DEFAULT 0,
+  kanta NUMERIC NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, trader_key, role, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS trade_rollups_monthly (LIKE trade_rollups_daily INCLUDING ALL);
+ALTER TABLE trade_rollups_monthly
+  ADD CONSTRAINT trade_rollups_monthly_user_id_fkey
+  FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE;
+
+-- Users read their own rollups; only the trigger writes them (through
+-- apply_rollup_delta(), limited to the caller's own rows by 014)
+ALTER TABLE trade_rollups_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE trade_rollups_monthly ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own daily rollups"
+  ON trade_rollups_daily
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view own monthly rollups"
+  ON trade_rollups_monthly
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Per-day contribution of one session payload, per trader and overall
+CREATE OR REPLACE FUNCTION rollup_contributions(p_purchases JSONB, p_sales JSONB)
+RETURNS TABLE (
+  bucket DATE, role TEXT, trader_key TEXT, record_count INTEGER,
+  bags NUMERIC, quintals NUMERIC, goods_amount NUMERIC, amount NUMERIC,
+  bardhan NUMERIC, kanta NUMERIC
+) AS $$
+  WITH records AS (
+    SELECT 'purchase' AS role, r FROM jsonb_array_elements(COALESCE(p_purchases, '[]'::jsonb)) r
+    UNION ALL
+    SELECT 'sale' AS role, r FROM jsonb_array_elements(COALESCE(p_sales, '[]'::jsonb)) r
+  ),
+  flat AS (
+    SELECT
+      safe_date(r->>'date') AS bucket,
+      role,
+      lower(COALESCE(r->>'traderName', 'Unknown')) AS trader_key,
+      COALESCE((r->>'totalBags')::numeric, 0) AS bags,
+      COALESCE((r->>'totalWeightInQuintals')::numeric, 0) AS quintals,
+      COALESCE((r->>'totalAmount')::numeric, 0) AS amount,
+      COALESCE((r->>'bardhanAmount')::numeric, 0) AS bardhan,
+      COALESCE((r->>'kantaAmount')::numeric, 0) AS kanta
+    FROM records
+  )
+  SELECT bucket, role, key, COUNT(*)::integer,
+         SUM(bags), SUM(quintals), SUM(amount - bardhan - kanta), SUM(amount),
+         SUM(bardhan), SUM(kanta)
+  FROM flat
+  CROSS JOIN LATERAL (VALUES (flat.trader_key), ('*')) AS k(key)
+  WHERE bucket IS NOT NULL
+  GROUP BY bucket, role, key;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one payload's contribution
+CREATE OR REPLACE FUNCTION apply_rollup_delta(p_user UUID, p_sign INTEGER, p_purchases JSONB, p_sales JSONB)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO trade_rollups_daily AS t
+    (user_id, bucket, role, trader_key, record_count, bags, quintals, goods_amount, amount, bardhan, kanta)
+  SELECT p_user, c.bucket, c.role, c.trader_key, p_sign * c.record_count, p_sign * c.bags,
+         p_sign * c.quintals, p_sign * c.goods_amount, p_sign * c.amount, p_sign * c.bardhan, p_sign * c.kanta
+  FROM rollup_contributions(p_purchases, p_sales) c
+  ON CONFLICT (user_id, trader_key, role, bucket) DO UPDATE SET
+    record_count = t.record_count + EXCLUDED.record_count,
+    bags = t.bags + EXCLUDED.bags,
+    quintals = t.quintals + EXCLUDED.quintals,
+    goods_amount = t.goods_amount + EXCLUDED.goods_amount,
+    amount = t.amount + EXCLUDED.amount,
+    bardhan = t.bardhan + EXCLUDED.bardhan,
+    kanta = t.kanta + EXCLUDED.kanta;
+
+  INSERT INTO trade_rollups_monthly AS t
+    (user_id, bucket, role, trader_key, record_count, bags, quintals, goods_amount, amount, bardhan, kanta)
+  SELECT p_user, date_trunc('month', c.bucket)::date, c.role, c.trader_key,
+         p_sign * SUM(c.record_count)::integer, p_sign * SUM(c.bags), p_sign * SUM(c.quintals),
+         p_sign * SUM(c.goods_amount), p_sign * SUM(c.amount), p_sign * SUM(c.bardhan), p_sign * SUM(c.kanta)
+  FROM rollup_contributions(p_purchases, p_sales) c
+  GROUP BY date_trunc('month', c.bucket), c.role, c.trader_key
+  ON CONFLICT (user_id, trader_key, role, bucket) DO UPDATE SET
+    record_count = t.record_count + EXCLUDED.record_count,
+    bags = t.bags + EXCLUDED.bags,
+    quintals = t.quintals + EXCLUDED.quintals,
+    goods_amount = t.goods_amount + EXCLUDED.goods_amount,
+    amount = t.amount + EXCLUDED.amount,
+    bardhan = t.bardhan + EXCLUDED.bardhan,
+    kanta = t.kanta + EXCLUDED.kanta;
+
+  IF p_sign < 0 THEN
+    DELETE FROM trade_rollups_daily WHERE user_id = p_user AND record_count <= 0;
+    DELETE FROM trade_rollups_monthly WHERE user_id = p_user AND record_count <= 0;
+  END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION maintain_trade_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM apply_rollup_delta(OLD.user_id, -1, OLD.purchases, OLD.sales);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM apply_rollup_delta(NEW.user_id, 1, NEW.purchases, NEW.sales);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trade_sessions_rollups_insert_delete ON trade_sessions;
+CREATE TRIGGER trade_sessions_rollups_insert_delete
+  AFTER INSERT OR DELETE ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION maintain_trade_rollups();
+
+DROP TRIGGER IF EXISTS trade_sessions_rollups_update ON trade_sessions;
+CREATE TRIGGER trade_sessions_rollups_update
+  AFTER UPDATE OF purchases, sales ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION maintain_trade_rollups();
+
+-- Backfill from existing sessions
+TRUNCATE trade_rollups_daily, trade_rollups_monthly;
+SELECT apply_rollup_delta(user_id, 1, purchases, sales) FROM trade_sessions;
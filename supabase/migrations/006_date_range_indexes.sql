@@ -0,0 +1,12 @@
+-- Migration: Indexes for date-range scoped history fetches
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- With a period selected the app fetches only sessions whose record dates
+-- (first_trade_date..last_trade_date, from 004_session_summary_columns.sql)
+-- overlap it, plus sessions created inside it. Both arms of that OR are
+-- served by a per-user index, combined with a bitmap OR.
+
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_user_last_trade_date
+  ON trade_sessions(user_id, last_trade_date);
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_user_created_at
+  ON trade_sessions(user_id, created_at DESC);
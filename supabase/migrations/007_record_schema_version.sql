@@ -0,0 +1,61 @@
+-- Migration: Versioned purchase/sale record schema
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- Older records may lack fields added over time (bardhan, kanta, payments,
+-- source seller, ...), so every reader had to fill in defaults. This fills
+-- them in once, stamps each record with schemaVersion 1, and keeps doing so
+-- for every write (including clients that still send partial records).
+-- A missing date falls back to the session's creation date.
+
+CREATE OR REPLACE FUNCTION normalize_trade_records(records JSONB, p_role TEXT, fallback_date DATE)
+RETURNS JSONB AS $$
+  SELECT COALESCE(
+    jsonb_agg(
+      CASE WHEN jsonb_typeof(r) = 'object' AND COALESCE((r->>'schemaVersion')::int, 0) < 1 THEN
+        jsonb_build_object(
+          'date', to_char(fallback_date, 'YYYY-MM-DD'),
+          'traderName', 'Unknown',
+          'entries', '[]'::jsonb,
+          'totalBags', 0,
+          'totalWeightInQuintals', 0,
+          'totalAmount', 0,
+          'amountPaid', 0,
+          'amountReceived', 0,
+          'bardhanRate', CASE WHEN p_role = 'purchase' THEN 25.0 ELSE 28.0 END,
+          'bardhanAmount', 0
+        )
+        || CASE WHEN p_role = 'purchase'
+             THEN jsonb_build_object('linkedSales', '[]'::jsonb)
+             ELSE jsonb_build_object('kantaRate', 7.5, 'kantaAmount', 0, 'sourceSeller', '')
+           END
+        || r
+        || jsonb_build_object('schemaVersion', 1)
+      ELSE r END
+      ORDER BY ord
+    ),
+    '[]'::jsonb
+  )
+  FROM jsonb_array_elements(COALESCE(records, '[]'::jsonb)) WITH ORDINALITY AS e(r, ord);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION normalize_session_records()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.purchases = normalize_trade_records(NEW.purchases, 'purchase', COALESCE(NEW.created_at, NOW())::date);
+  NEW.sales = normalize_trade_records(NEW.sales, 'sale', COALESCE(NEW.created_at, NOW())::date);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trade_sessions_normalize_records ON trade_sessions;
+CREATE TRIGGER trade_sessions_normalize_records
+  BEFORE INSERT OR UPDATE OF purchases, sales ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION normalize_session_records();
+
+-- One-time backfill of rows that still have unversioned records
+UPDATE trade_sessions
+SET purchases = normalize_trade_records(purchases, 'purchase', created_at::date),
+    sales = normalize_trade_records(sales, 'sale', created_at::date)
+WHERE jsonb_path_exists(COALESCE(purchases, '[]'::jsonb) || COALESCE(sales, '[]'::jsonb),
+                        '$[*] ? (!exists(@.schemaVersion))');
@@ -0,0 +1,150 @@
+-- Migration: Season close, session archive and carried-forward opening balances
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- close_season(p_season_end) moves every session whose records all fall on
+-- or before p_season_end out of trade_sessions into trade_sessions_archive,
+-- and replaces what was still unpaid/unreceived on them with one
+-- opening_balances row per trader. The app reads trade_sessions and
+-- opening_balances on every load; the archive only on demand (search and
+-- export), so per-rerun cost stays bounded by the open season.
+--
+-- A trader's opening balance also carries whatever was still outstanding
+-- on their opening balance from an earlier close. Payments recorded after
+-- the close settle the opening balance first (opening_balances.settled).
+-- Trend rollups keep the archived sessions' contributions.
+
+CREATE TABLE IF NOT EXISTS trade_sessions_archive (LIKE trade_sessions INCLUDING DEFAULTS);
+ALTER TABLE trade_sessions_archive
+  ADD COLUMN IF NOT EXISTS season_end DATE,
+  ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+ALTER TABLE trade_sessions_archive ADD PRIMARY KEY (id);
+ALTER TABLE trade_sessions_archive
+  ADD CONSTRAINT trade_sessions_archive_user_id_fkey
+  FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE;
+
+-- Archive search reads one closed season at a time
+CREATE INDEX IF NOT EXISTS idx_trade_sessions_archive_user_season
+  ON trade_sessions_archive(user_id, season_end DESC, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS opening_balances (
+  id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  season_end DATE NOT NULL,
+  role TEXT NOT NULL CHECK (role IN ('seller', 'buyer')),
+  trader_key TEXT NOT NULL,
+  trader_name TEXT NOT NULL,
+  amount NUMERIC NOT NULL DEFAULT 0,
+  settled NUMERIC NOT NULL DEFAULT 0,
+  UNIQUE (user_id, role, trader_key)
+);
+
+DROP TRIGGER IF EXISTS opening_balances_set_updated_at ON opening_balances;
+CREATE TRIGGER opening_balances_set_updated_at
+  BEFORE UPDATE ON opening_balances
+  FOR EACH ROW
+  EXECUTE FUNCTION set_updated_at();
+
+ALTER TABLE trade_sessions_archive ENABLE ROW LEVEL SECURITY;
+ALTER TABLE opening_balances ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own archived sessions"
+  ON trade_sessions_archive
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own archived sessions"
+  ON trade_sessions_archive
+  FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can view own opening balances"
+  ON opening_balances
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own opening balances"
+  ON opening_balances
+  FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own opening balances"
+  ON opening_balances
+  FOR UPDATE
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own opening balances"
+  ON opening_balances
+  FOR DELETE
+  USING (auth.uid() = user_id);
+
+-- Close every season up to p_season_end for the calling user, in one
+-- transaction. Mirrors close_season_plan() in trade_core.py, which the app
+-- runs itself when this function isn't deployed.
+CREATE OR REPLACE FUNCTION close_season(p_season_end DATE)
+RETURNS TABLE (archived_sessions INTEGER, opening_rows INTEGER)
+LANGUAGE plpgsql VOLATILE SECURITY INVOKER
+AS $$
+DECLARE
+  uid UUID := auth.uid();
+  moved_count INTEGER;
+  balance_count INTEGER;
+BEGIN
+  -- A record's day is its date, or its session's creation date if the
+  -- date isn't ISO (record_day() in the app)
+  CREATE TEMP TABLE closing ON COMMIT DROP AS
+  SELECT s.*
+  FROM trade_sessions s
+  WHERE s.user_id = uid
+    AND COALESCE(s.last_trade_date, s.created_at::date) <= p_season_end
+    AND NOT EXISTS (
+      SELECT 1 FROM jsonb_array_elements(s.purchases || s.sales) r
+      WHERE COALESCE(safe_date(r->>'date'), s.created_at::date) > p_season_end
+    );
+
+  INSERT INTO trade_sessions_archive
+  SELECT c.*, p_season_end, NOW() FROM closing c;
+  GET DIAGNOSTICS moved_count = ROW_COUNT;
+
+  DELETE FROM trade_sessions s USING closing c WHERE s.id = c.id;
+  -- The delete trigger took these out of the rollups; trends keep them
+  PERFORM apply_rollup_delta(uid, 1, c.purchases, c.sales) FROM closing c;
+
+  CREATE TEMP TABLE closing_balances ON COMMIT DROP AS
+  WITH records AS (
+    SELECT 'seller' AS role, r, r->>'amountPaid' AS settled, c.created_at, c.id, e.ord
+    FROM closing c CROSS JOIN LATERAL jsonb_array_elements(c.purchases) WITH ORDINALITY AS e(r, ord)
+    UNION ALL
+    SELECT 'buyer' AS role, r, r->>'amountReceived' AS settled, c.created_at, c.id, e.ord
+    FROM closing c CROSS JOIN LATERAL jsonb_array_elements(c.sales) WITH ORDINALITY AS e(r, ord)
+  ),
+  pending AS (
+    -- First spelling in history order, as in the app's aggregates
+    SELECT role, lower(COALESCE(r->>'traderName', 'Unknown')) AS trader_key,
+           (array_agg(COALESCE(r->>'traderName', 'Unknown') ORDER BY created_at DESC, id, ord))[1] AS trader_name,
+           SUM(COALESCE((r->>'totalAmount')::numeric, 0) - COALESCE(settled::numeric, 0)) AS amount,
+           1 AS src
+    FROM records
+    GROUP BY role, lower(COALESCE(r->>'traderName', 'Unknown'))
+  ),
+  carried AS (
+    SELECT role, trader_key, trader_name, amount - settled AS amount, 2 AS src
+    FROM opening_balances
+    WHERE user_id = uid
+  )
+  SELECT role, trader_key, (array_agg(trader_name ORDER BY src))[1] AS trader_name, SUM(amount) AS amount
+  FROM (SELECT * FROM pending UNION ALL SELECT * FROM carried) both_sources
+  GROUP BY role, trader_key;
+
+  DELETE FROM opening_balances WHERE user_id = uid;
+  INSERT INTO opening_balances (user_id, season_end, role, trader_key, trader_name, amount, settled)
+  SELECT uid, p_season_end, role, trader_key, trader_name, round(amount, 2), 0
+  FROM closing_balances
+  WHERE abs(amount) >= 0.005;
+  GET DIAGNOSTICS balance_count = ROW_COUNT;
+
+  RETURN QUERY SELECT moved_count, balance_count;
+END;
+$$;
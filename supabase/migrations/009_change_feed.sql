@@ -0,0 +1,10 @@
+-- Migration: Publish opening balances to the change feed
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- trade_sessions is already in the supabase_realtime publication
+-- (001_create_trade_sessions.sql). The app subscribes to both tables per
+-- user (change_feed.py): trade_sessions changes are applied to its cached
+-- history, opening_balances changes make it re-read that user's balances.
+-- Realtime checks row level security before delivering inserts/updates.
+
+ALTER PUBLICATION supabase_realtime ADD TABLE opening_balances;
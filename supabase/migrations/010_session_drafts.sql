@@ -0,0 +1,55 @@
+-- Migration: Server-side drafts of in-progress sessions
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- The session being edited (its purchases, sales and unsaved weigh
+-- entries) used to live only in the server's memory for that browser tab.
+-- The app now autosaves it here in the background (draft_autosave.py):
+-- one header row per user plus one row per purchase/sale record, so an
+-- edit rewrites only the records that changed. The draft is restored on
+-- login and deleted when the session is saved or reset.
+
+CREATE TABLE IF NOT EXISTS session_drafts (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  current_session_id UUID,
+  session_name TEXT NOT NULL DEFAULT '',
+  purchase_entries JSONB NOT NULL DEFAULT '[]'::jsonb,
+  sale_entries JSONB NOT NULL DEFAULT '[]'::jsonb,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS session_draft_records (
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  record_id TEXT NOT NULL,
+  role TEXT NOT NULL CHECK (role IN ('purchase', 'sale')),
+  position INTEGER NOT NULL,
+  record JSONB NOT NULL,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (user_id, record_id)
+);
+
+DROP TRIGGER IF EXISTS session_drafts_set_updated_at ON session_drafts;
+CREATE TRIGGER session_drafts_set_updated_at
+  BEFORE UPDATE ON session_drafts
+  FOR EACH ROW
+  EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS session_draft_records_set_updated_at ON session_draft_records;
+CREATE TRIGGER session_draft_records_set_updated_at
+  BEFORE UPDATE ON session_draft_records
+  FOR EACH ROW
+  EXECUTE FUNCTION set_updated_at();
+
+ALTER TABLE session_drafts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE session_draft_records ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can manage own draft"
+  ON session_drafts
+  FOR ALL
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can manage own draft records"
+  ON session_draft_records
+  FOR ALL
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);
@@ -0,0 +1,65 @@
+-- Migration: get_trader_ledger() also returns each row's session creation time
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- A record without an ISO date counts on its session's creation date
+-- (record_day() in the app). With session_created_at in the ledger rows,
+-- the trader view scopes a trader's records to the selected date range
+-- from the ledger alone, without loading the history. Ties on created_at
+-- are now ordered by session id, like the app's history.
+
+-- The result columns change, so the function has to be dropped first
+DROP FUNCTION IF EXISTS get_trader_ledger(TEXT, TEXT);
+
+CREATE OR REPLACE FUNCTION get_trader_ledger(p_trader TEXT, p_role TEXT)
+RETURNS TABLE (
+  session_id UUID,
+  session_name TEXT,
+  session_created_at TIMESTAMP WITH TIME ZONE,
+  record_id TEXT,
+  date TEXT,
+  bags NUMERIC,
+  amount NUMERIC,
+  paid NUMERIC,
+  received NUMERIC,
+  pending NUMERIC,
+  source_seller TEXT
+)
+LANGUAGE plpgsql STABLE SECURITY INVOKER
+AS $$
+DECLARE
+  trader_key TEXT := lower(p_trader);
+  probe JSONB := jsonb_build_array(jsonb_build_object('traderKey', lower(p_trader)));
+BEGIN
+  IF p_role = 'seller' THEN
+    RETURN QUERY
+    SELECT s.id, s.session_name, s.created_at, r->>'id', COALESCE(r->>'date', ''),
+           COALESCE((r->>'totalBags')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0),
+           COALESCE((r->>'amountPaid')::numeric, 0),
+           COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0) - COALESCE((r->>'amountPaid')::numeric, 0),
+           ''::text
+    FROM trade_sessions s
+    CROSS JOIN LATERAL jsonb_array_elements(s.purchases) WITH ORDINALITY AS e(r, ord)
+    WHERE s.user_id = auth.uid()
+      AND s.purchases @> probe
+      AND r->>'traderKey' = trader_key
+    ORDER BY s.created_at DESC, s.id, e.ord;
+  ELSE
+    RETURN QUERY
+    SELECT s.id, s.session_name, s.created_at, r->>'id', COALESCE(r->>'date', ''),
+           COALESCE((r->>'totalBags')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0),
+           COALESCE((r->>'amountPaid')::numeric, 0),
+           COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE((r->>'totalAmount')::numeric, 0) - COALESCE((r->>'amountReceived')::numeric, 0),
+           COALESCE(r->>'sourceSeller', '')
+    FROM trade_sessions s
+    CROSS JOIN LATERAL jsonb_array_elements(s.sales) WITH ORDINALITY AS e(r, ord)
+    WHERE s.user_id = auth.uid()
+      AND s.sales @> probe
+      AND r->>'traderKey' = trader_key
+    ORDER BY s.created_at DESC, s.id, e.ord;
+  END IF;
+END;
+$$;
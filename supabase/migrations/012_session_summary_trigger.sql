@@ -0,0 +1,68 @@
+-- Migration: Keep the session summary columns in sync on every write
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- 004_session_summary_columns.sql only backfilled the summary columns; the
+-- app writes them itself (session_row() in trade_core.py), but sessions
+-- saved by the React client in src/ or any other writer got zero bags, no
+-- trader names and no first/last trade dates, so they listed wrongly and
+-- fell out of date-range fetches. A trigger now computes them from the
+-- records on every insert and update, whichever client wrote.
+
+-- Distinct trader names in order of first appearance, as session_row() lists them
+CREATE OR REPLACE FUNCTION record_trader_names(records JSONB)
+RETURNS TEXT[] AS $$
+  SELECT COALESCE(array_agg(name ORDER BY first_ord), '{}')
+  FROM (
+    SELECT r->>'traderName' AS name, MIN(ord) AS first_ord
+    FROM jsonb_array_elements(COALESCE(records, '[]'::jsonb)) WITH ORDINALITY AS e(r, ord)
+    WHERE r->>'traderName' IS NOT NULL
+    GROUP BY r->>'traderName'
+  ) names;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION record_total_bags(records JSONB)
+RETURNS INTEGER AS $$
+  SELECT COALESCE(SUM(COALESCE((r->>'totalBags')::numeric, 0)), 0)::integer
+  FROM jsonb_array_elements(COALESCE(records, '[]'::jsonb)) r;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION set_session_summary()
+RETURNS TRIGGER AS $$
+DECLARE
+  all_records JSONB := COALESCE(NEW.purchases, '[]'::jsonb) || COALESCE(NEW.sales, '[]'::jsonb);
+BEGIN
+  NEW.total_bags_purchased = record_total_bags(NEW.purchases);
+  NEW.total_bags_sold = record_total_bags(NEW.sales);
+  NEW.seller_names = record_trader_names(NEW.purchases);
+  NEW.buyer_names = record_trader_names(NEW.sales);
+  NEW.purchase_count = jsonb_array_length(COALESCE(NEW.purchases, '[]'::jsonb));
+  NEW.sale_count = jsonb_array_length(COALESCE(NEW.sales, '[]'::jsonb));
+  NEW.first_trade_date = (SELECT MIN(safe_date(x->>'date')) FROM jsonb_array_elements(all_records) x);
+  NEW.last_trade_date = (SELECT MAX(safe_date(x->>'date')) FROM jsonb_array_elements(all_records) x);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Named to fire after trade_sessions_normalize_records (BEFORE triggers run
+-- in name order), so records that got a fallback date count with it
+DROP TRIGGER IF EXISTS trade_sessions_set_summary ON trade_sessions;
+CREATE TRIGGER trade_sessions_set_summary
+  BEFORE INSERT OR UPDATE ON trade_sessions
+  FOR EACH ROW
+  EXECUTE FUNCTION set_session_summary();
+
+-- Fix the rows written without the columns since 004 (the trigger fills them in)
+UPDATE trade_sessions
+SET purchase_count = purchase_count
+WHERE total_bags_purchased IS DISTINCT FROM record_total_bags(purchases)
+   OR total_bags_sold IS DISTINCT FROM record_total_bags(sales)
+   OR seller_names IS DISTINCT FROM record_trader_names(purchases)
+   OR buyer_names IS DISTINCT FROM record_trader_names(sales)
+   OR purchase_count IS DISTINCT FROM jsonb_array_length(COALESCE(purchases, '[]'::jsonb))
+   OR sale_count IS DISTINCT FROM jsonb_array_length(COALESCE(sales, '[]'::jsonb))
+   OR first_trade_date IS DISTINCT FROM (
+        SELECT MIN(safe_date(x->>'date'))
+        FROM jsonb_array_elements(COALESCE(purchases, '[]'::jsonb) || COALESCE(sales, '[]'::jsonb)) x)
+   OR last_trade_date IS DISTINCT FROM (
+        SELECT MAX(safe_date(x->>'date'))
+        FROM jsonb_array_elements(COALESCE(purchases, '[]'::jsonb) || COALESCE(sales, '[]'::jsonb)) x);
@@ -0,0 +1,24 @@
+-- Migration: One autosaved draft per browser tab
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- 010_session_drafts.sql kept one draft per user, so two tabs editing
+-- different sessions overwrote each other's draft, and saving in one tab
+-- deleted the other's. Drafts are now keyed by a draft_id the app makes
+-- up for each tab. On login the app offers the user's other drafts
+-- ("Restore unsaved draft?") instead of loading one silently.
+
+ALTER TABLE session_drafts ADD COLUMN IF NOT EXISTS draft_id UUID NOT NULL DEFAULT gen_random_uuid();
+ALTER TABLE session_draft_records ADD COLUMN IF NOT EXISTS draft_id UUID;
+
+-- Existing records belong to their user's only draft
+UPDATE session_draft_records r
+SET draft_id = d.draft_id
+FROM session_drafts d
+WHERE d.user_id = r.user_id AND r.draft_id IS NULL;
+DELETE FROM session_draft_records WHERE draft_id IS NULL;
+ALTER TABLE session_draft_records ALTER COLUMN draft_id SET NOT NULL;
+
+ALTER TABLE session_drafts DROP CONSTRAINT IF EXISTS session_drafts_pkey;
+ALTER TABLE session_drafts ADD PRIMARY KEY (user_id, draft_id);
+ALTER TABLE session_draft_records DROP CONSTRAINT IF EXISTS session_draft_records_pkey;
+ALTER TABLE session_draft_records ADD PRIMARY KEY (user_id, draft_id, record_id);
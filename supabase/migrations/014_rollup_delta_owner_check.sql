@@ -0,0 +1,60 @@
+-- Migration: Only let apply_rollup_delta() change the caller's own rollups
+-- Run this SQL in your Supabase SQL Editor (Dashboard > SQL Editor)
+--
+-- apply_rollup_delta() (005_trade_rollups.sql) is SECURITY DEFINER, so it
+-- writes trade_rollups_* past row level security, and it is exposed as an
+-- RPC: any signed-in user could add to or delete another user's rollups by
+-- passing their id. It now refuses any p_user other than the caller. It
+-- can't be revoked from signed-in users altogether: the trade_sessions
+-- trigger and close_season() (008_season_close.sql) run as the caller and
+-- call it.
+
+CREATE OR REPLACE FUNCTION apply_rollup_delta(p_user UUID, p_sign INTEGER, p_purchases JSONB, p_sales JSONB)
+RETURNS VOID AS $$
+BEGIN
+  -- The trigger and close_season() pass the caller's own id; the backfill
+  -- and other server-side jobs run without auth.uid()
+  IF auth.uid() IS NOT NULL AND p_user IS DISTINCT FROM auth.uid() THEN
+    RAISE EXCEPTION 'apply_rollup_delta: cannot change the rollups of another user'
+      USING ERRCODE = '42501';
+  END IF;
+
+  INSERT INTO trade_rollups_daily AS t
+    (user_id, bucket, role, trader_key, record_count, bags, quintals, goods_amount, amount, bardhan, kanta)
+  SELECT p_user, c.bucket, c.role, c.trader_key, p_sign * c.record_count, p_sign * c.bags,
+         p_sign * c.quintals, p_sign * c.goods_amount, p_sign * c.amount, p_sign * c.bardhan, p_sign * c.kanta
+  FROM rollup_contributions(p_purchases, p_sales) c
+  ON CONFLICT (user_id, trader_key, role, bucket) DO UPDATE SET
+    record_count = t.record_count + EXCLUDED.record_count,
+    bags = t.bags + EXCLUDED.bags,
+    quintals = t.quintals + EXCLUDED.quintals,
+    goods_amount = t.goods_amount + EXCLUDED.goods_amount,
+    amount = t.amount + EXCLUDED.amount,
+    bardhan = t.bardhan + EXCLUDED.bardhan,
+    kanta = t.kanta + EXCLUDED.kanta;
+
+  INSERT INTO trade_rollups_monthly AS t
+    (user_id, bucket, role, trader_key, record_count, bags, quintals, goods_amount, amount, bardhan, kanta)
+  SELECT p_user, date_trunc('month', c.bucket)::date, c.role, c.trader_key,
+         p_sign * SUM(c.record_count)::integer, p_sign * SUM(c.bags), p_sign * SUM(c.quintals),
+         p_sign * SUM(c.goods_amount), p_sign * SUM(c.amount), p_sign * SUM(c.bardhan), p_sign * SUM(c.kanta)
+  FROM rollup_contributions(p_purchases, p_sales) c
+  GROUP BY date_trunc('month', c.bucket), c.role, c.trader_key
+  ON CONFLICT (user_id, trader_key, role, bucket) DO UPDATE SET
+    record_count = t.record_count + EXCLUDED.record_count,
+    bags = t.bags + EXCLUDED.bags,
+    quintals = t.quintals + EXCLUDED.quintals,
+    goods_amount = t.goods_amount + EXCLUDED.goods_amount,
+    amount = t.amount + EXCLUDED.amount,
+    bardhan = t.bardhan + EXCLUDED.bardhan,
+    kanta = t.kanta + EXCLUDED.kanta;
+
+  IF p_sign < 0 THEN
+    DELETE FROM trade_rollups_daily WHERE user_id = p_user AND record_count <= 0;
+    DELETE FROM trade_rollups_monthly WHERE user_id = p_user AND record_count <= 0;
+  END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION apply_rollup_delta(UUID, INTEGER, JSONB, JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION apply_rollup_delta(UUID, INTEGER, JSONB, JSONB) TO authenticated, service_role;
@@ -0,0 +1,81 @@
+"""Trader detail actions that write twice in one rerun, against the local backend.
+
+    python -m pytest tests
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).resolve().parent.parent / "streamlit_app.py")
+
+
+@pytest.fixture
+def db_path(monkeypatch):
+    path = tempfile.mktemp(suffix=".json")
+    monkeypatch.setenv("CHILLI_BACKEND", "local")
+    monkeypatch.setenv("CHILLI_LOCAL_DB", path)
+    monkeypatch.setenv("CHILLI_SHARED_CACHE_PATH", tempfile.mktemp())
+    yield path
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def logged_in_tab():
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.run()
+    at.text_input(key="login_email").input("t@b.c")
+    at.text_input(key="login_pw").input("pw")
+    at.button[0].click()
+    at.run()
+    assert not at.exception, at.exception
+    return at
+
+
+def save_purchase_session(at, trader: str):
+    """One purchase of 5 bags, 100 kg at ₹1000/quintal, nothing paid."""
+    at.text_input(key="purchase_trader_input").input(trader)
+    at.text_input(key="p_bags").input("5")
+    at.text_input(key="p_weight").input("100")
+    at.text_input(key="p_rate").input("1000")
+    next(b for b in at.button if b.form_id == "purchase_entry_form").click()
+    at.run()
+    at.button(key="save_purchase").click()
+    at.run()
+    next(b for b in at.button if b.label == "Save Session").click()
+    at.run()
+    assert not at.exception, at.exception
+
+
+def stored_purchases(path):
+    with open(path) as f:
+        sessions = json.load(f)["tables"]["trade_sessions"].values()
+    return [p for sess in sessions for p in sess["purchases"]]
+
+
+def test_two_writes_in_one_rerun_both_land(db_path):
+    at = logged_in_tab()
+    save_purchase_session(at, "Ram")
+    [purchase] = stored_purchases(db_path)
+    assert purchase["amountPaid"] == 0
+
+    at.button(key="sel_toggle_Ram").click()
+    at.run()
+    # Writes totalAmount, then amountPaid
+    at.text_input(key="sel_edit_total_Ram_0").input("2000")
+    at.button(key="sel_edit_total_btn_Ram_0").click()
+    at.run()
+    assert not at.exception, at.exception
+    [purchase] = stored_purchases(db_path)
+    assert (purchase["totalAmount"], purchase["amountPaid"]) == (2000, 2000)
+
+    # Sets the advance to 0, then adds the new amount
+    at.text_input(key="sel_edit_adv_Ram").input("500")
+    at.button(key="sel_edit_btn_Ram").click()
+    at.run()
+    assert not at.exception, at.exception
+    [purchase] = stored_purchases(db_path)
+    assert (purchase["totalAmount"], purchase["amountPaid"]) == (2000, 500)
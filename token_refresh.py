@@ -0,0 +1,225 @@
+import base64
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN_SECONDS = 120  # Refresh this long before the JWT `exp`
+RETRY_DELAY_SECONDS = 30      # Back-off after a failed background refresh
+MIN_REFRESH_INTERVAL = 10     # Guards against tokens that live shorter than the margin
+ACTIVE_SECONDS = 60           # Only refresh users some tab checked in for this recently...
+IDLE_SECONDS = 1800           # ...and forget users none has checked in for this long
+
+
+def _jwt_claims(token: str) -> dict:
+    """The payload of a JWT, unverified (the server checks the signature)."""
+    payload = token.split(".")[1]
+    payload += "=" * (-len(payload) % 4)
+    return json.loads(base64.urlsafe_b64decode(payload))
+
+
+def jwt_expiry(token: str):
+    """Return the `exp` claim of a JWT (unix seconds), or None if unreadable."""
+    try:
+        return float(_jwt_claims(token)["exp"])
+    except Exception:
+        return None
+
+
+def jwt_subject(token: str):
+    """Return the `sub` claim (the user id) of a JWT, or None if unreadable."""
+    try:
+        return str(_jwt_claims(token)["sub"])
+    except Exception:
+        return None
+
+
+def supabase_client_for(url: str, key: str):
+    """Per-request PostgREST clients carrying the caller's token, over one shared connection pool."""
+    import httpx
+    from postgrest import SyncPostgrestClient
+
+    http = httpx.Client(base_url=f"{url}/rest/v1", timeout=30)
+
+    def client_for(token):
+        return SyncPostgrestClient(
+            f"{url}/rest/v1", headers={"apikey": key, "Authorization": f"Bearer {token or key}"}, http_client=http,
+        )
+
+    return client_for
+
+
+def supabase_refresh_fn(url: str, key: str):
+    """A TokenRefresher `refresh_fn` exchanging refresh tokens on a throwaway auth client.
+
+    Refreshing on a client shared by the process would also make its stored
+    session that of whichever user refreshed last.
+    """
+    def refresh(refresh_token: str):
+        from supabase_auth import SyncGoTrueClient
+
+        auth = SyncGoTrueClient(
+            url=f"{url}/auth/v1", headers={"apikey": key}, auto_refresh_token=False, persist_session=False,
+        )
+        return auth.refresh_session(refresh_token)
+
+    return refresh
+
+
+def is_expired_token_error(exc: Exception) -> bool:
+    """True if a PostgREST/auth error was caused by an expired access token."""
+    code = getattr(exc, "code", None)
+    if code in ("PGRST301", "PGRST303"):
+        return True
+    return "jwt expired" in str(exc).lower()
+
+
+class TokenRefresher:
+    """Keeps access tokens of active users fresh from a background thread.
+
+    `refresh_fn(refresh_token)` must return an object with a `.session`
+    carrying `access_token`, `refresh_token` and `user` (a Supabase
+    AuthResponse). Refreshes for the same user are single-flighted: Supabase
+    rotates refresh tokens, so two concurrent refreshes would revoke each other.
+
+    Open tabs check in with touch(). Only users seen within ACTIVE_SECONDS
+    are refreshed in the background (a token rotated after the last check-in
+    would never reach the tab's session state); one that comes back later
+    is refreshed on demand. Users unseen for IDLE_SECONDS are forgotten.
+    """
+
+    def __init__(self, refresh_fn, margin: float = REFRESH_MARGIN_SECONDS,
+                 active: float = ACTIVE_SECONDS, idle: float = IDLE_SECONDS):
+        self._refresh_fn = refresh_fn
+        self._margin = margin
+        self._active = active
+        self._idle = idle
+        self._tokens = {}       # user_id -> {user, access_token, refresh_token, expires_at, retry_at, seen_at}
+        self._user_locks = {}   # user_id -> Lock (single-flight)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def track(self, user, access_token: str, refresh_token: str):
+        """Start (or update) background refresh for a logged-in user."""
+        with self._cond:
+            self._tokens[user.id] = {
+                "user": user,
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "expires_at": jwt_expiry(access_token) or time.time(),
+                "retry_at": 0,
+                "seen_at": time.time(),
+            }
+            self._user_locks.setdefault(user.id, threading.Lock())
+            self._ensure_thread()
+            self._cond.notify()
+            return dict(self._tokens[user.id])
+
+    def touch(self, user_id):
+        """Note that a tab of the user is still open (keeps its tokens refreshed)."""
+        with self._cond:
+            entry = self._tokens.get(user_id)
+            if entry is not None:
+                was_active = time.time() - entry["seen_at"] <= self._active
+                entry["seen_at"] = time.time()
+                if not was_active:
+                    self._cond.notify()  # Its refresh may be overdue
+
+    def forget(self, user_id):
+        """Stop refreshing tokens for a user (on logout, or once idle)."""
+        with self._cond:
+            self._tokens.pop(user_id, None)
+            self._user_locks.pop(user_id, None)
+
+    def get(self, user_id):
+        """Return the cached token entry for a user, or None if not tracked."""
+        with self._cond:
+            entry = self._tokens.get(user_id)
+            return dict(entry) if entry else None
+
+    def refresh(self, user_id, stale_token: str = None):
+        """Refresh a user's token now, single-flighted per user.
+
+        If `stale_token` is given and the cached token already differs from
+        it, another caller refreshed in the meantime and its result is reused.
+        """
+        with self._cond:
+            lock = self._user_locks.get(user_id)
+        if lock is None:
+            return None
+
+        with lock:
+            with self._cond:
+                entry = self._tokens.get(user_id)
+            if entry is None:
+                return None
+            if stale_token is not None and entry["access_token"] != stale_token:
+                return dict(entry)
+            if stale_token is None and entry["expires_at"] - time.time() > self._margin:
+                return dict(entry)
+
+            res = self._refresh_fn(entry["refresh_token"])
+            session = res.session if res else None
+            if session is None:
+                raise RuntimeError("Token refresh returned no session")
+            with self._cond:
+                if user_id not in self._tokens:
+                    return None
+                self._tokens[user_id].update({
+                    "user": session.user or entry["user"],
+                    "access_token": session.access_token,
+                    "refresh_token": session.refresh_token,
+                    "expires_at": jwt_expiry(session.access_token) or time.time(),
+                    "retry_at": time.time() + MIN_REFRESH_INTERVAL,
+                })
+                self._cond.notify()
+                return dict(self._tokens[user_id])
+
+    # ── Scheduler ─────────────────────────────────────────────────────
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+            self._thread.start()
+
+    def _next_due(self):
+        """Return (user_id, due_at) of the next active user's token to refresh."""
+        now = time.time()
+        due = [
+            (max(e["expires_at"] - self._margin, e["retry_at"]), uid)
+            for uid, e in self._tokens.items()
+            if now - e["seen_at"] <= self._active
+        ]
+        if not due:
+            return None, None
+        due_at, uid = min(due)
+        return uid, due_at
+
+    def _forget_idle(self):
+        now = time.time()
+        for uid in [uid for uid, e in self._tokens.items() if now - e["seen_at"] > self._idle]:
+            logger.info("Forgetting tokens of idle user %s", uid)
+            self._tokens.pop(uid, None)
+            self._user_locks.pop(uid, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._forget_idle()
+                uid, due_at = self._next_due()
+                # Also wake when the next user goes idle, to forget them
+                wake = [e["seen_at"] + self._idle for e in self._tokens.values()]
+                if uid is not None:
+                    wake.append(due_at)
+                delay = min(wake) - time.time() if wake else None
+                if uid is None or due_at > time.time():
+                    self._cond.wait(timeout=None if delay is None else max(delay, 0.01))
+                    continue
+            try:
+                self.refresh(uid)
+            except Exception as e:
+                logger.warning("Background token refresh failed for %s: %s", uid, e)
+                with self._cond:
+                    if uid in self._tokens:
+                        self._tokens[uid]["retry_at"] = time.time() + RETRY_DELAY_SECONDS
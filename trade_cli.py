@@ -0,0 +1,292 @@
+"""Batch trade computations over a dump of trade_sessions, without the UI.
+
+    python trade_cli.py aggregate sessions.ndjson --workers 4
+    python trade_cli.py ledger sessions.parquet --role seller --trader "Ramesh"
+    python trade_cli.py statement sessions.ndjson --role buyer --from 2026-01-01 --to 2026-03-31
+    python trade_cli.py statements sessions.ndjson --user-id <uuid> --workers 4 --output statements.zip
+    python trade_cli.py statement sessions.ndjson --opening-balances opening_balances.ndjson
+
+The dump is NDJSON (one row per line, as exported from the table) or
+Parquet; purchases/sales may be JSON columns or JSON-encoded strings.
+Rows must be in the app's history order (created_at descending, then id),
+which is what the figures depend on; a dump in any other order is sorted
+in memory first. Results are JSON keyed by user_id.
+
+--workers N splits the dump into contiguous slices and computes each in
+its own process: aggregates are merged slice by slice in history order
+(AggregateBuilder.merge), ledger rows are concatenated. `statements`
+also renders one user's statements to CSV and PDF on N processes and
+writes them as a zip (statements.py).
+
+--opening-balances takes a dump of the opening_balances table (same
+formats) after a season close; aggregates and statements then include
+the carried-forward balances, as the app's figures do.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from statements import statements_zip
+from trade_core import (
+    AggregateBuilder, apply_opening_balances, opening_balances_in_range, slice_sessions, trader_ledgers,
+    trader_statement, upgrade_session_records,
+)
+
+SLICES_PER_WORKER = 4  # More slices than workers evens out uneven slices
+
+
+def dump_format(path: str) -> str:
+    return "parquet" if path.endswith((".parquet", ".pq")) else "ndjson"
+
+
+def plan_slices(path: str, fmt: str, count: int):
+    """Split the dump into `count` contiguous (start, stop) ranges: byte offsets for NDJSON, rows for Parquet."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        total = pq.ParquetFile(path).metadata.num_rows
+    else:
+        total = os.path.getsize(path)
+    bounds = [total * i // count for i in range(count + 1)]
+    if fmt == "ndjson":
+        # Move every inner boundary to the start of the next line
+        with open(path, "rb") as f:
+            for i in range(1, count):
+                f.seek(bounds[i] - 1)
+                f.readline()
+                bounds[i] = max(f.tell(), bounds[i - 1])
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def read_slice(path: str, fmt: str, start: int, stop: int):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        rows = []
+        parquet = pq.ParquetFile(path)
+        offset = 0
+        for group in range(parquet.num_row_groups):
+            size = parquet.metadata.row_group(group).num_rows
+            if offset < stop and offset + size > start:
+                table = parquet.read_row_group(group)
+                lo, hi = max(start - offset, 0), min(stop - offset, size)
+                rows += table.slice(lo, hi - lo).to_pylist()
+            offset += size
+    else:
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(stop - start)
+        rows = [json.loads(line) for line in data.splitlines() if line.strip()]
+    for row in rows:
+        for field in ("purchases", "sales"):
+            if isinstance(row.get(field), str):
+                row[field] = json.loads(row[field])
+            elif row.get(field) is None:
+                row[field] = []
+        upgrade_session_records(row)
+    return rows
+
+
+def read_opening_balances(path: str):
+    """Rows of an opening_balances dump, with season_end as an ISO date and amounts as floats."""
+    if dump_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        rows = pq.read_table(path).to_pylist()
+    else:
+        with open(path, "rb") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        row["season_end"] = str(row["season_end"])[:10]
+        row["amount"] = float(row["amount"])
+        row["settled"] = float(row["settled"])
+    return rows
+
+
+def _history_key(row):
+    return str(row.get("created_at") or ""), str(row.get("id") or "")
+
+
+def _in_order(a, b) -> bool:
+    """True if history key `a` may come before `b`: created_at descending, then id ascending."""
+    return a[0] > b[0] or (a[0] == b[0] and a[1] <= b[1])
+
+
+def in_history_order(rows) -> bool:
+    keys = [_history_key(r) for r in rows]
+    return all(_in_order(a, b) for a, b in zip(keys, keys[1:]))
+
+
+def compute(command: str, rows, options: dict):
+    """One slice's partial result per user: an AggregateBuilder, or ledger rows by trader."""
+    by_user = {}
+    for row in rows:
+        if options["user_id"] and row.get("user_id") != options["user_id"]:
+            continue
+        by_user.setdefault(row.get("user_id"), []).append(row)
+
+    partials = {}
+    for user_id, sessions in by_user.items():
+        sessions = slice_sessions(sessions, options["date_range"])
+        if command == "aggregate":
+            builder = AggregateBuilder()
+            builder.add_sessions(sessions)
+            partials[user_id] = builder
+            continue
+        ledgers = trader_ledgers(sessions, options["role"])
+        if options["traders"]:
+            wanted = {t.lower() for t in options["traders"]}
+            ledgers = {name: rows for name, rows in ledgers.items() if name.lower() in wanted}
+        # Keyed case-insensitively so slices merge; the first slice's spelling is shown
+        partials[user_id] = {name.lower(): (name, records) for name, records in ledgers.items()}
+    return partials
+
+
+def run_slice(task):
+    command, path, fmt, start, stop, options = task
+    rows = read_slice(path, fmt, start, stop)
+    ordered = in_history_order(rows)
+    bounds = (_history_key(rows[0]), _history_key(rows[-1])) if rows else None
+    return compute(command, rows, options), ordered, bounds
+
+
+def combine(command: str, partials_in_order):
+    """Merge per-slice partials (given in history order) into per-user results."""
+    merged = {}
+    for partials in partials_in_order:
+        for user_id, partial in partials.items():
+            if user_id not in merged:
+                merged[user_id] = partial
+            elif command == "aggregate":
+                merged[user_id].merge(partial)
+            else:
+                for key, (display, records) in partial.items():
+                    if key in merged[user_id]:
+                        merged[user_id][key][1].extend(records)
+                    else:
+                        merged[user_id][key] = (display, records)
+    return merged
+
+
+def opening_by_user(options: dict) -> dict:
+    """The opening balances that count in the date range, per user (only --user-id's if given)."""
+    by_user = {}
+    for ob in opening_balances_in_range(options["opening_balances"], options["date_range"]):
+        if not options["user_id"] or ob["user_id"] == options["user_id"]:
+            by_user.setdefault(ob["user_id"], []).append(ob)
+    return by_user
+
+
+def render(command: str, merged, options: dict):
+    opening = opening_by_user(options)
+    if command == "aggregate":
+        return {
+            user_id: apply_opening_balances(builder.result(), opening.get(user_id, []))
+            for user_id, builder in merged.items()
+        }
+    if command == "ledger":
+        return {
+            user_id: {display: records for display, records in traders.values()}
+            for user_id, traders in merged.items()
+        }
+    role = options["role"]
+    wanted = {t.lower() for t in options["traders"]} if options["traders"] else None
+    result = {}
+    for user_id in {**merged, **opening}:
+        traders = dict(merged.get(user_id, {}))
+        balances = {
+            ob["trader_key"]: ob for ob in opening.get(user_id, [])
+            if ob["role"] == role and (wanted is None or ob["trader_key"] in wanted)
+        }
+        # A trader with only a carried-forward balance still gets a statement
+        for key, ob in balances.items():
+            traders.setdefault(key, (ob["trader_name"], []))
+        result[user_id] = {
+            display: trader_statement(records, role, balances.get(key)) for key, (display, records) in traders.items()
+        }
+    return result
+
+
+def run(command: str, path: str, options: dict, workers: int = 1):
+    fmt = dump_format(path)
+    slices = plan_slices(path, fmt, max(1, workers) * (SLICES_PER_WORKER if workers > 1 else 1))
+    tasks = [(command, path, fmt, start, stop, options) for start, stop in slices]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_slice, tasks))
+    else:
+        results = [run_slice(task) for task in tasks]
+
+    bounds = [b for _, _, b in results if b is not None]
+    # Each slice checked its own rows; the seams between slices are checked here
+    ordered = all(ok for _, ok, _ in results) and all(
+        _in_order(last, first) for (_, last), (first, _) in zip(bounds, bounds[1:])
+    )
+    if not ordered:
+        print("Dump isn't in history order (created_at desc, id); sorting it in memory", file=sys.stderr)
+        rows = [row for start, stop in slices for row in read_slice(path, fmt, start, stop)]
+        rows.sort(key=lambda r: str(r.get("id") or ""))
+        rows.sort(key=lambda r: str(r.get("created_at") or ""), reverse=True)
+        return render(command, combine(command, [compute(command, rows, options)]), options)
+    return render(command, combine(command, [partials for partials, _, _ in results]), options)
+
+
+def write_statements_zip(path: str, options: dict, workers: int, output: str, roles):
+    """Render one user's statements (both sides unless --role) into a zip, reporting progress on stderr."""
+    statements = []
+    for role in roles:
+        by_user = run("statement", path, {**options, "role": role}, workers=workers)
+        if len(by_user) > 1:
+            raise SystemExit("The dump has several users; pick one with --user-id")
+        for traders in by_user.values():
+            statements += [(role, name, statement) for name, statement in traders.items()]
+
+    def on_progress(done, total):
+        print(f"\rRendered {done}/{total} statements", end="" if done < total else "\n", file=sys.stderr)
+
+    data = statements_zip(statements, workers=workers, as_of=options["date_range"][1] if options["date_range"] else None,
+                          on_progress=on_progress)
+    with open(output, "wb") as f:
+        f.write(data)
+    print(f"Wrote {len(statements)} statements to {output}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trade computations over a trade_sessions dump")
+    parser.add_argument("command", choices=("aggregate", "ledger", "statement", "statements"))
+    parser.add_argument("dump", help="NDJSON (.ndjson/.jsonl) or Parquet (.parquet) dump of trade_sessions")
+    parser.add_argument("--role", choices=("seller", "buyer"),
+                        help="ledger/statement side (default seller); statements renders both unless given")
+    parser.add_argument("--trader", action="append", help="only this trader; repeat for several (default every trader)")
+    parser.add_argument("--user-id", help="only this user's sessions")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first record date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last record date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to shard the dump across")
+    parser.add_argument("--opening-balances", help="dump of opening_balances to include in aggregates and statements")
+    parser.add_argument("--output", help="write JSON here instead of stdout; the zip for statements")
+    args = parser.parse_args(argv)
+
+    if (args.start is None) != (args.end is None):
+        parser.error("--from and --to go together")
+    options = {
+        "role": args.role or "seller",
+        "traders": args.trader,
+        "user_id": args.user_id,
+        "date_range": (args.start, args.end) if args.start else None,
+        "opening_balances": read_opening_balances(args.opening_balances) if args.opening_balances else [],
+    }
+    if args.command == "statements":
+        roles = (args.role,) if args.role else ("seller", "buyer")
+        write_statements_zip(args.dump, options, args.workers, args.output or "statements.zip", roles)
+        return
+    result = run(args.command, args.dump, options, workers=args.workers)
+    text = json.dumps(result, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+from datetime import date as date_type, timedelta
+
+from record_codec import derive_entry, encode_records, parse_weight_to_quintals  # noqa: F401 (re-exported)
+
+# Trade arithmetic and aggregation shared by the Streamlit app and
+# trade_cli.py. Nothing here imports Streamlit or talks to Supabase: every
+# function takes sessions/records as plain dicts, as stored in trade_sessions.
+
+DEFAULT_BARDHAN_RATE_SELLER = 25.0  # For purchases (buying from sellers)
+DEFAULT_BARDHAN_RATE_BUYER = 28.0   # For sales (selling to buyers)
+DEFAULT_KANTA_RATE = 7.5
+
+# Purchase/sale records carry every field from this version on
+# (007_record_schema_version.sql backfills and enforces it server-side)
+RECORD_SCHEMA_VERSION = 1
+
+
+def weigh_entry(bags, weight, rate, entry_id=None) -> dict:
+    """One weigh entry: `weight` is in the 528.5 = 5 Q + 28.5 kg notation."""
+    return {"id": entry_id, **derive_entry(bags, weight, rate)}
+
+
+def entry_totals(entries) -> dict:
+    """Bags, quintals and amount over a record's weigh entries."""
+    return {
+        "bags": sum(e["bags"] for e in entries),
+        "quintals": sum(e["weightInQuintals"] for e in entries),
+        "amount": sum(e["totalAmount"] for e in entries),
+    }
+
+
+def purchase_charges(entries, bardhan_rate: float = DEFAULT_BARDHAN_RATE_SELLER) -> dict:
+    """Bardhan and grand total of a purchase (what is owed to the seller)."""
+    totals = entry_totals(entries)
+    bardhan = totals["bags"] * bardhan_rate
+    return {**totals, "bardhan": bardhan, "grand_total": totals["amount"] + bardhan}
+
+
+def sale_charges(entries, bardhan_rate: float = DEFAULT_BARDHAN_RATE_BUYER,
+                 kanta_rate: float = DEFAULT_KANTA_RATE) -> dict:
+    """Bardhan, kanta and grand total of a sale (what the buyer owes)."""
+    totals = entry_totals(entries)
+    bardhan = totals["bags"] * bardhan_rate
+    kanta = totals["bags"] * kanta_rate
+    return {**totals, "bardhan": bardhan, "kanta": kanta, "grand_total": totals["amount"] + bardhan + kanta}
+
+
+def is_iso_date(value) -> bool:
+    """True for 'YYYY-MM-DD' strings (record dates are free text once edited)."""
+    try:
+        date_type.fromisoformat(value)
+        return len(value) == 10
+    except (TypeError, ValueError):
+        return False
+
+
+def session_row(purchases, sales, compact: bool = False) -> dict:
+    """Payload plus the summary columns stored with it (004_session_summary_columns.sql).
+
+    Every write of purchases/sales goes through here, so the list view can
+    render, search and sort sessions from the columns alone. `compact`
+    stores entries in the column encoding (record_codec.py).
+    """
+    total_purchase = sum(p["totalAmount"] for p in purchases)
+    total_sale = sum(s["totalAmount"] for s in sales)
+    dates = [r.get("date") for r in (*purchases, *sales) if is_iso_date(r.get("date"))]
+    return {
+        "purchases": encode_records(purchases) if compact else purchases,
+        "sales": encode_records(sales) if compact else sales,
+        "total_purchase_amount": total_purchase,
+        "total_sale_amount": total_sale,
+        "net_profit": total_sale - total_purchase,
+        "total_bags_purchased": sum(p["totalBags"] for p in purchases),
+        "total_bags_sold": sum(s["totalBags"] for s in sales),
+        "seller_names": list(dict.fromkeys(p["traderName"] for p in purchases)),
+        "buyer_names": list(dict.fromkeys(s["traderName"] for s in sales)),
+        "purchase_count": len(purchases),
+        "sale_count": len(sales),
+        "first_trade_date": min(dates) if dates else None,
+        "last_trade_date": max(dates) if dates else None,
+    }
+
+
+def record_defaults(role: str, fallback_date: str) -> dict:
+    """Fields every record of RECORD_SCHEMA_VERSION has; role is "purchase" or "sale"."""
+    defaults = {
+        "date": fallback_date,
+        "traderName": "Unknown",
+        "entries": [],
+        "totalBags": 0,
+        "totalWeightInQuintals": 0,
+        "totalAmount": 0,
+        "amountPaid": 0,
+        "amountReceived": 0,
+        "bardhanAmount": 0,
+    }
+    if role == "purchase":
+        defaults.update(bardhanRate=DEFAULT_BARDHAN_RATE_SELLER, linkedSales=[])
+    else:
+        defaults.update(bardhanRate=DEFAULT_BARDHAN_RATE_BUYER, kantaRate=DEFAULT_KANTA_RATE,
+                        kantaAmount=0, sourceSeller="")
+    return defaults
+
+
+def upgrade_session_records(sess):
+    """Bring a fetched row's records up to RECORD_SCHEMA_VERSION, in place.
+
+    Only rows written before 007_record_schema_version.sql still need
+    this; for current rows it's one version check per record.
+    """
+    fallback_date = (sess.get("created_at") or "")[:10] or str(date_type.today())
+    for field, role in (("purchases", "purchase"), ("sales", "sale")):
+        records = sess.get(field) or []
+        if all(r.get("schemaVersion", 0) >= RECORD_SCHEMA_VERSION for r in records):
+            continue
+        sess[field] = [
+            r if r.get("schemaVersion", 0) >= RECORD_SCHEMA_VERSION
+            else {**record_defaults(role, fallback_date), **r, "schemaVersion": RECORD_SCHEMA_VERSION}
+            for r in records
+        ]
+    return sess
+
+
+def record_day(rec, sess):
+    """A record's date, or its session's creation date when the record's isn't ISO."""
+    for value in (rec.get("date"), (sess.get("created_at") or "")[:10]):
+        if is_iso_date(value):
+            return date_type.fromisoformat(value)
+    return None
+
+
+def slice_sessions(sessions, date_range):
+    """Sessions with only the records dated inside date_range (start, end), for aggregates.
+
+    Editors keep working on whole sessions; only the figures are scoped.
+    """
+    if date_range is None:
+        return sessions
+    start, end = date_range
+    sliced = []
+    for sess in sessions:
+        purchases = [p for p in sess.get("purchases", []) if start <= (record_day(p, sess) or date_type.min) <= end]
+        sales = [r for r in sess.get("sales", []) if start <= (record_day(r, sess) or date_type.min) <= end]
+        if purchases or sales:
+            sliced.append({**sess, "purchases": purchases, "sales": sales})
+    return sliced
+
+
+def range_namespace(name: str, date_range) -> str:
+    """Shared cache namespace for data scoped to a date range."""
+    if date_range is None:
+        return name
+    return f"{name}:{date_range[0].isoformat()}:{date_range[1].isoformat()}"
+
+
+def version_from_rows(rows):
+    """Data version of a set of rows: row count + latest updated_at."""
+    if rows and "updated_at" not in rows[0]:
+        return None  # 002_add_updated_at.sql not applied
+    latest = max((r["updated_at"] or "" for r in rows), default="")
+    return f"{len(rows)}:{latest}"
+
+
+def session_last_day(sess):
+    """Latest record day in a session (record_day), or its creation date if it has no records."""
+    records = (*sess.get("purchases", []), *sess.get("sales", []))
+    days = [d for d in (record_day(r, sess) for r in records or ({},)) if d is not None]
+    return max(days) if days else None
+
+
+def close_season_plan(sessions, opening_balances, season_end):
+    """(sessions to archive, opening balance rows) for closing every season up to season_end.
+
+    Mirrors close_season() in 008_season_close.sql: a session is archived
+    once all its records fall on or before season_end, and each trader's
+    unsettled amount on the archived sessions, plus what is still
+    outstanding on their current opening balance, becomes one new opening
+    balance row. `sessions` must be in history order (newest first).
+    """
+    closing = [
+        sess for sess in sessions
+        if (session_last_day(sess) or date_type.max) <= season_end
+    ]
+    balances = {}  # (role, trader_key) -> row
+    for sess in closing:
+        for role, field, settled in (("seller", "purchases", "amountPaid"), ("buyer", "sales", "amountReceived")):
+            for rec in sess.get(field, []):
+                row = balances.setdefault((role, rec["traderName"].lower()), {
+                    "role": role, "trader_key": rec["traderName"].lower(),
+                    "trader_name": rec["traderName"], "amount": 0,
+                })
+                row["amount"] += rec["totalAmount"] - rec[settled]
+    for ob in opening_balances:
+        row = balances.setdefault((ob["role"], ob["trader_key"]), {
+            "role": ob["role"], "trader_key": ob["trader_key"], "trader_name": ob["trader_name"], "amount": 0,
+        })
+        row["amount"] += ob["amount"] - ob["settled"]
+    rows = [
+        {**row, "amount": round(row["amount"], 2), "settled": 0, "season_end": season_end.isoformat()}
+        for row in balances.values() if abs(row["amount"]) >= 0.005
+    ]
+    return closing, rows
+
+
+def record_series(sessions, trader_key: str = "*", role: str = None) -> dict:
+    """Per-record time series for charts: {column: [(day, value)]}, oldest first.
+
+    One point per record with a day (record_day), for one trader ("*" for
+    all) of `role` ("purchase"/"sale", None for both). Columns are named
+    like the Trends rollup columns ("Purchase amount", "Sale rate/Q", ...);
+    "Margin" is the running net profit (sales less purchases) after each record.
+    """
+    records = []
+    # Sessions arrive newest first; oldest first keeps same-day records in entry order
+    for sess in reversed(sessions):
+        for rec_role, field in (("purchase", "purchases"), ("sale", "sales")):
+            if role is not None and rec_role != role:
+                continue
+            for rec in sess.get(field, []):
+                if trader_key != "*" and rec["traderName"].lower() != trader_key:
+                    continue
+                day = record_day(rec, sess)
+                if day is not None:
+                    records.append((day, rec_role, rec))
+    records.sort(key=lambda item: item[0])
+
+    series = {}
+    net = 0
+    for day, rec_role, rec in records:
+        prefix = "Purchase" if rec_role == "purchase" else "Sale"
+        quintals = rec["totalWeightInQuintals"]
+        charges = rec["bardhanAmount"] + (rec["kantaAmount"] if rec_role == "sale" else 0)
+        points = {
+            f"{prefix} amount": rec["totalAmount"],
+            f"{prefix} bags": rec["totalBags"],
+            f"{prefix} quintals": quintals,
+            f"{prefix} bardhan": rec["bardhanAmount"],
+        }
+        if quintals:
+            points[f"{prefix} rate/Q"] = (rec["totalAmount"] - charges) / quintals
+        if rec_role == "sale":
+            points["Sale kanta"] = rec["kantaAmount"]
+        net += rec["totalAmount"] if rec_role == "sale" else -rec["totalAmount"]
+        points["Margin"] = net
+        for column, value in points.items():
+            series.setdefault(column, []).append((day, value))
+    return series
+
+
+def _ledger_row(sess, rec, trader_type: str) -> dict:
+    if trader_type == "seller":
+        return {
+            "session_id": sess["id"],
+            "session_name": sess["session_name"],
+            "record_id": rec.get("id"),
+            "date": rec["date"],
+            "bags": rec["totalBags"],
+            "amount": rec["totalAmount"],
+            "paid": rec["amountPaid"],
+            "pending": rec["totalAmount"] - rec["amountPaid"],
+        }
+    return {
+        "session_id": sess["id"],
+        "session_name": sess["session_name"],
+        "record_id": rec.get("id"),
+        "date": rec["date"],
+        "bags": rec["totalBags"],
+        "amount": rec["totalAmount"],
+        "received": rec["amountReceived"],
+        "pending": rec["totalAmount"] - rec["amountReceived"],
+        "source_seller": rec["sourceSeller"],
+    }
+
+
+def trader_records(sessions, trader_name: str, trader_type: str):
+    """Ledger rows of one trader ("seller" or "buyer") across sessions, in history order."""
+    field = "purchases" if trader_type == "seller" else "sales"
+    key = trader_name.lower()
+    return [
+        _ledger_row(sess, rec, trader_type)
+        for sess in sessions
+        for rec in sess.get(field, [])
+        if rec["traderName"].lower() == key
+    ]
+
+
+def trader_ledgers(sessions, trader_type: str) -> dict:
+    """Ledger rows of every trader of one side in a single pass: {display name: rows}.
+
+    Names are matched case-insensitively; the first spelling seen is used.
+    """
+    field = "purchases" if trader_type == "seller" else "sales"
+    display = {}
+    ledgers = {}
+    for sess in sessions:
+        for rec in sess.get(field, []):
+            key = rec["traderName"].lower()
+            name = display.setdefault(key, rec["traderName"])
+            ledgers.setdefault(name, []).append(_ledger_row(sess, rec, trader_type))
+    return ledgers
+
+
+def opening_balance_row(opening_balance, trader_type: str) -> dict:
+    """A carried-forward opening balance as a ledger row, dated at the end of the season it came from."""
+    settled = "paid" if trader_type == "seller" else "received"
+    row = {
+        "session_id": None,
+        "session_name": "Opening balance",
+        "record_id": None,
+        "date": opening_balance["season_end"],
+        "bags": 0,
+        "amount": opening_balance["amount"],
+        settled: opening_balance["settled"],
+        "pending": opening_balance["amount"] - opening_balance["settled"],
+    }
+    if trader_type == "buyer":
+        row["source_seller"] = ""
+    return row
+
+
+def trader_statement(records, trader_type: str, opening_balance=None) -> dict:
+    """A trader's ledger rows oldest first, each with the running balance, plus totals.
+
+    Rows whose date isn't ISO sort after the dated ones, in ledger order.
+    An opening balance (a row of opening_balances) comes first and counts
+    in the totals, as apply_opening_balances() counts it in the stats.
+    """
+    settled = "paid" if trader_type == "seller" else "received"
+    dated = [r for r in records if is_iso_date(r["date"])]
+    ordered = sorted(dated, key=lambda r: r["date"]) + [r for r in records if not is_iso_date(r["date"])]
+    if opening_balance is not None:
+        ordered.insert(0, opening_balance_row(opening_balance, trader_type))
+    rows = []
+    balance = 0
+    for rec in ordered:
+        balance += rec["amount"] - rec[settled]
+        rows.append({**rec, "balance": round(balance, 2)})
+    return {
+        "rows": rows,
+        "bags": sum(r["bags"] for r in ordered),
+        "amount": round(sum(r["amount"] for r in ordered), 2),
+        settled: round(sum(r[settled] for r in ordered), 2),
+        "pending": round(balance, 2),
+    }
+
+
+def _merge_counterparties(mine, other):
+    for name, totals in other.items():
+        into = mine.setdefault(name, {"bags": 0, "amount": 0})
+        into["bags"] += totals["bags"]
+        into["amount"] += totals["amount"]
+
+
+class AggregateBuilder:
+    """Aggregate stats built up session by session.
+
+    Sessions must be added in history order (newest first): the first
+    spelling of a name wins, and a sale only counts towards its source
+    seller's sold_to if that seller's purchases were seen before it.
+
+    Builders over consecutive slices of the history can be combined with
+    merge(), so the slices can be aggregated in parallel.
+    """
+
+    def __init__(self):
+        self.total_purchase = 0
+        self.total_sale = 0
+        self.total_bags_purchased = 0
+        self.total_bags_sold = 0
+        self.total_paid = 0
+        self.total_received = 0
+        self.all_sellers = {}  # name -> {bags, amount, paid, pending, sold_to: {buyer: {bags, amount}}}
+        self.all_buyers = {}   # name -> {bags, amount, received, pending, bought_from: {seller: {bags, amount}}}
+        # Track original display names (first occurrence wins)
+        self.seller_display_names = {}
+        self.buyer_display_names = {}
+        # Sales whose source seller hadn't been seen yet: (seller key, buyer, bags, amount).
+        # A builder over an earlier slice may still know that seller (see merge)
+        self.unresolved_sales = []
+
+    def add_sessions(self, sessions):
+        for sess in sessions:
+            self.add_session(sess)
+
+    def add_session(self, sess):
+        all_sellers = self.all_sellers
+        all_buyers = self.all_buyers
+        for p in sess.get("purchases", []):
+            raw_name = p["traderName"]
+            name = raw_name.lower()
+            if name not in self.seller_display_names:
+                self.seller_display_names[name] = raw_name
+            amt = p["totalAmount"]
+            bags = p["totalBags"]
+            paid = p["amountPaid"]
+
+            self.total_purchase += amt
+            self.total_bags_purchased += bags
+            self.total_paid += paid
+
+            if name not in all_sellers:
+                all_sellers[name] = {"bags": 0, "amount": 0, "paid": 0, "sold_to": {}}
+            all_sellers[name]["bags"] += bags
+            all_sellers[name]["amount"] += amt
+            all_sellers[name]["paid"] += paid
+
+        for s in sess.get("sales", []):
+            raw_buyer = s["traderName"]
+            buyer_name = raw_buyer.lower()
+            if buyer_name not in self.buyer_display_names:
+                self.buyer_display_names[buyer_name] = raw_buyer
+            source_seller = s["sourceSeller"]
+            amt = s["totalAmount"]
+            bags = s["totalBags"]
+            received = s["amountReceived"]
+
+            self.total_sale += amt
+            self.total_bags_sold += bags
+            self.total_received += received
+
+            if buyer_name not in all_buyers:
+                all_buyers[buyer_name] = {"bags": 0, "amount": 0, "received": 0, "bought_from": {}}
+            all_buyers[buyer_name]["bags"] += bags
+            all_buyers[buyer_name]["amount"] += amt
+            all_buyers[buyer_name]["received"] += received
+
+            # Track relationships with bags and amount
+            if source_seller:
+                source_key = source_seller.lower()
+                # Track in buyer: bought_from which seller
+                if source_seller not in all_buyers[buyer_name]["bought_from"]:
+                    all_buyers[buyer_name]["bought_from"][source_seller] = {"bags": 0, "amount": 0}
+                all_buyers[buyer_name]["bought_from"][source_seller]["bags"] += bags
+                all_buyers[buyer_name]["bought_from"][source_seller]["amount"] += amt
+                # Track in seller: sold_to which buyer
+                if source_key in all_sellers:
+                    if raw_buyer not in all_sellers[source_key]["sold_to"]:
+                        all_sellers[source_key]["sold_to"][raw_buyer] = {"bags": 0, "amount": 0}
+                    all_sellers[source_key]["sold_to"][raw_buyer]["bags"] += bags
+                    all_sellers[source_key]["sold_to"][raw_buyer]["amount"] += amt
+                else:
+                    self.unresolved_sales.append((source_key, raw_buyer, bags, amt))
+
+    def merge(self, later):
+        """Fold in a builder over the slice of history right after this one's (older sessions)."""
+        for field in ("total_purchase", "total_sale", "total_bags_purchased", "total_bags_sold",
+                      "total_paid", "total_received"):
+            setattr(self, field, getattr(self, field) + getattr(later, field))
+        for names, later_names in ((self.seller_display_names, later.seller_display_names),
+                                   (self.buyer_display_names, later.buyer_display_names)):
+            for key, display in later_names.items():
+                names.setdefault(key, display)
+
+        # Resolve the later slice's pending sales against sellers seen before
+        # it, i.e. in this slice; the rest stay pending for an earlier one
+        still_unresolved = []
+        for source_key, raw_buyer, bags, amt in later.unresolved_sales:
+            seller = self.all_sellers.get(source_key)
+            if seller is None:
+                still_unresolved.append((source_key, raw_buyer, bags, amt))
+                continue
+            sold = seller["sold_to"].setdefault(raw_buyer, {"bags": 0, "amount": 0})
+            sold["bags"] += bags
+            sold["amount"] += amt
+
+        for key, other in later.all_sellers.items():
+            mine = self.all_sellers.get(key)
+            if mine is None:
+                self.all_sellers[key] = other
+                continue
+            for field in ("bags", "amount", "paid"):
+                mine[field] += other[field]
+            _merge_counterparties(mine["sold_to"], other["sold_to"])
+        for key, other in later.all_buyers.items():
+            mine = self.all_buyers.get(key)
+            if mine is None:
+                self.all_buyers[key] = other
+                continue
+            for field in ("bags", "amount", "received"):
+                mine[field] += other[field]
+            _merge_counterparties(mine["bought_from"], other["bought_from"])
+
+        self.unresolved_sales += still_unresolved
+        return self
+
+    def result(self):
+        # Add pending to each trader and remap to display names
+        display_sellers = {}
+        for key, seller in self.all_sellers.items():
+            seller["pending"] = seller["amount"] - seller["paid"]
+            display_sellers[self.seller_display_names.get(key, key)] = seller
+
+        display_buyers = {}
+        for key, buyer in self.all_buyers.items():
+            buyer["pending"] = buyer["amount"] - buyer["received"]
+            display_buyers[self.buyer_display_names.get(key, key)] = buyer
+
+        return {
+            "total_purchase": self.total_purchase,
+            "total_sale": self.total_sale,
+            "net_profit": self.total_sale - self.total_purchase,
+            "total_bags_purchased": self.total_bags_purchased,
+            "total_bags_sold": self.total_bags_sold,
+            "remaining_bags": self.total_bags_purchased - self.total_bags_sold,
+            "total_paid": self.total_paid,
+            "total_received": self.total_received,
+            "pending_to_pay": self.total_purchase - self.total_paid,
+            "pending_to_receive": self.total_sale - self.total_received,
+            "sellers": display_sellers,
+            "buyers": display_buyers,
+        }
+
+
+def get_aggregate_stats(sessions):
+    """Calculate aggregate stats from all sessions."""
+    builder = AggregateBuilder()
+    builder.add_sessions(sessions)
+    return builder.result()
+
+
+def opening_balances_in_range(balances, date_range):
+    """Balances that belong in figures for date_range: they open on the day after their season_end."""
+    if date_range is None:
+        return balances
+    start, end = date_range
+    return [
+        ob for ob in balances
+        if start <= date_type.fromisoformat(ob["season_end"]) + timedelta(days=1) <= end
+    ]
+
+
+def apply_opening_balances(stats, opening_balances):
+    """Aggregate stats with carried-forward opening balances added in.
+
+    Each balance counts towards its trader's amount and paid/received
+    (`settled`), and what is still outstanding on it towards the trader's
+    pending and the overall pending_to_pay / pending_to_receive. Traders
+    with only an opening balance get a row of their own. `stats` isn't
+    modified (it is usually a shared cached copy).
+    """
+    out = {**stats, "opening_to_pay": 0, "opening_to_receive": 0}
+    for role, group, paid_key, links, total in (
+        ("seller", "sellers", "paid", "sold_to", "opening_to_pay"),
+        ("buyer", "buyers", "received", "bought_from", "opening_to_receive"),
+    ):
+        traders = out[group] = dict(stats[group])
+        display = {name.lower(): name for name in traders}
+        for ob in opening_balances:
+            if ob["role"] != role:
+                continue
+            name = display.setdefault(ob["trader_key"], ob["trader_name"])
+            trader = traders[name] = {
+                **traders.get(name, {"bags": 0, "amount": 0, paid_key: 0, "pending": 0, links: {}}),
+            }
+            outstanding = ob["amount"] - ob["settled"]
+            trader["amount"] += ob["amount"]
+            trader[paid_key] += ob["settled"]
+            trader["pending"] += outstanding
+            trader["opening"] = {"amount": ob["amount"], "settled": ob["settled"], "season_end": ob["season_end"]}
+            out[total] += outstanding
+    out["pending_to_pay"] = stats["pending_to_pay"] + out["opening_to_pay"]
+    out["pending_to_receive"] = stats["pending_to_receive"] + out["opening_to_receive"]
+    return out